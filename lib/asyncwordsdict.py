@@ -0,0 +1,107 @@
+# @file asyncwordsdict.py
+# @brief Asyncio front-end of dictionary of all words.
+# @author Sielskyi Leonid (sielskyi)
+#
+
+# Description
+#
+# Shard files I/O of WordsDict is done in bounded thread pool executor.
+# Concurrent requests of words with the same first symbol and language
+# are collected while the event loop runs and resolved by one
+# WordsDict.get_word_indices call, so the shard is read once for them.
+#
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import wordsdict
+from wordsdict import WordsDict
+
+
+class AsyncWordsDict:
+    "Asyncio front-end of WordsDict with non-blocking shard I/O"
+
+    def __init__(self, wdict=None, max_workers=4, **kwargs):
+        """wdict - WordsDict to use (flushed by close), new WordsDict(**kwargs) closed by close if None
+        max_workers - maximum number of shard I/O threads"""
+        self._owner = wdict is None
+        self._wdict = wdict if wdict is not None else WordsDict(**kwargs)
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._batches = {}              # (first symbol, lang) -> [(word, future)] waiting for I/O
+        self._running = set()           # (first symbol, lang) of batches in I/O
+
+    async def get_word_index(self, string, lang=''):
+        assert isinstance(string, str), "Parameter \'string\' is not a string"
+        assert isinstance(lang, str), "Parameter \'lang\' is not a string"
+        assert (len(string) > 0), "Parameter \'string\' is empty"
+
+        if wordsdict._BLANK_RECOMP.search(string) or \
+                (self._wdict._get_first_index(string) < wordsdict._WORD_IN_FILE_START):
+            return self._wdict.get_word_index(string, lang)      # no shard I/O
+
+        loop = asyncio.get_running_loop()
+        key = (string[0], lang)
+        future = loop.create_future()
+        batch = self._batches.setdefault(key, [])
+        batch.append((string, future))
+        if (len(batch) == 1) and (key not in self._running):
+            loop.call_soon(self._run_batch, key)      # after all requests of this loop iteration
+        return await future
+
+    async def get_word_indices(self, strings, lang=''):
+        if not isinstance(strings, str):
+            strings = list(strings)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._wdict.get_word_indices, strings, lang)
+
+    async def check_word(self, string, lang=''):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._wdict.check_word, string, lang)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    def close(self):
+        "Wait for shard I/O, write buffered new words and stop executor"
+        self._executor.shutdown()
+        self._close_wdict()
+
+    async def aclose(self):
+        "Write buffered new words in executor and stop it"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close_wdict)
+        self._executor.shutdown()
+
+    def _close_wdict(self):
+        if self._owner:
+            self._wdict.close()
+        else:
+            self._wdict.flush()
+
+    def _run_batch(self, key):
+        batch = self._batches.pop(key, None)
+        if not batch:
+            return
+        self._running.add(key)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._wdict.get_word_indices,
+                                      [string for string, wfuture in batch], key[1])
+        future.add_done_callback(functools.partial(self._set_batch_result, key, batch))
+
+    def _set_batch_result(self, key, batch, future):
+        self._running.discard(key)
+        for i, (string, wfuture) in enumerate(batch):
+            if wfuture.done():
+                continue                # request is cancelled
+            if future.cancelled():      # executor future is cancelled, e.g. at loop shutdown
+                wfuture.cancel()
+            elif future.exception() is not None:
+                wfuture.set_exception(future.exception())
+            else:
+                wfuture.set_result(future.result()[i])
+        if key in self._batches:
+            self._run_batch(key)        # requests came during I/O of this batch
@@ -0,0 +1,287 @@
+# @file datetimearray.py
+# @brief Arrays of date-time values for batch manipulating.
+# @author Sielskyi Leonid (sielskyi)
+#
+
+# Description
+#
+# DateTimeArray keeps date-time values in NumPy int64 array of miliseconds
+# since 0000-01-01 00:00:00.000, the same values as DateTimeExt.get_msecs.
+# Calendar rules are the same as of datetimeext functions: proleptic
+# Gregorian calendar, year 0 is leap.
+#
+
+try:
+    import numpy
+except ImportError:
+    numpy = None                    # DateTimeArray can not be used
+
+import datetimeext
+from datetimeext import DateTimeExt
+
+if numpy is not None:
+    _DAYS_IN_MONTH = numpy.array(datetimeext._DAYS_IN_MONTH, dtype=numpy.int64)
+    _DAYS_BEFORE_MONTH = numpy.array(datetimeext._DAYS_BEFORE_MONTH, dtype=numpy.int64)
+
+
+def check_years_are_leap(years):
+    "years array -> mask of leap years"
+    years = numpy.asarray(years)
+    return (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+
+
+def get_days_in_months(years, months):
+    "years, months arrays -> number of days in months, months must be valid"
+    months = numpy.asarray(months)
+    return _DAYS_IN_MONTH[months] + ((months == 2) & check_years_are_leap(years))
+
+
+def check_month_array(months):
+    "Get mask of valid numeric values of months"
+    months = numpy.asarray(months)
+    return (months >= 1) & (months <= 12)
+
+
+def check_day_array(days, years=0, months=1):
+    "Get mask of valid numeric values of days with optional years and months"
+    days, years, months = numpy.broadcast_arrays(days, years, months)
+    valid = check_month_array(months)
+    maxdays = get_days_in_months(years, numpy.where(valid, months, 1))
+    return valid & (days >= 1) & (days <= maxdays)
+
+
+def check_hours_array(hours):
+    "Get mask of valid numeric values of hours"
+    hours = numpy.asarray(hours)
+    return (hours >= 0) & (hours <= 23)
+
+
+def check_minutes_array(mins):
+    "Get mask of valid numeric values of minutes"
+    mins = numpy.asarray(mins)
+    return (mins >= 0) & (mins <= 59)
+
+
+def check_seconds_array(secs):
+    "Get mask of valid numeric values of seconds"
+    secs = numpy.asarray(secs)
+    return (secs >= 0) & (secs <= 59)
+
+
+def check_miliseconds_array(msecs):
+    "Get mask of valid numeric values of miliseconds"
+    msecs = numpy.asarray(msecs)
+    return (msecs >= 0) & (msecs <= 999)
+
+
+def check_date_time_array(years=0, months=1, days=1, hours=0, mins=0, secs=0, msecs=0):
+    "Get mask of valid date-time values"
+    return check_day_array(days, years, months) & check_hours_array(hours) & check_minutes_array(mins) & \
+        check_seconds_array(secs) & check_miliseconds_array(msecs)
+
+
+def get_ordinals_from_dates(years, months, days):
+    "years, months, days arrays -> numbers of days since 0000-01-01, months must be valid"
+    years = numpy.asarray(years, dtype=numpy.int64)
+    months = numpy.asarray(months, dtype=numpy.int64)
+    y = years - 1
+    before = years * 365 + y // 4 - y // 100 + y // 400 + 1     # year 0 is leap
+    before += _DAYS_BEFORE_MONTH[months] + ((months > 2) & check_years_are_leap(years))
+    return before + numpy.asarray(days, dtype=numpy.int64) - 1
+
+
+def get_dates_from_ordinals(ordinals):
+    "numbers of days since 0000-01-01 array -> (years, months, days) arrays"
+    n400, n = numpy.divmod(numpy.asarray(ordinals, dtype=numpy.int64) - 366, datetimeext._DAYS_IN_400_YEARS)
+    n100, n = numpy.divmod(n, datetimeext._DAYS_IN_100_YEARS)
+    n4, n = numpy.divmod(n, datetimeext._DAYS_IN_4_YEARS)
+    n1, n = numpy.divmod(n, 365)
+    years = n400 * 400 + n100 * 100 + n4 * 4 + n1 + 1
+    last = (n1 == 4) | (n100 == 4)      # the last day of leap year ending the cycle
+    years = numpy.where(last, years - 1, years)
+    n = numpy.where(last, 365, n)
+
+    leap = check_years_are_leap(years)
+    months = (n + 50) >> 5              # estimate is the month or the next month
+    before = _DAYS_BEFORE_MONTH[months] + ((months > 2) & leap)
+    months = numpy.where(before > n, months - 1, months)
+    before = _DAYS_BEFORE_MONTH[months] + ((months > 2) & leap)
+    return (years, months, n - before + 1)
+
+
+def get_msecs_from_date_time_array(years=0, months=1, days=1, hours=0, mins=0, secs=0, msecs=0):
+    "Get miliseconds since 0000-01-01 00:00:00.000 of date-time arrays, months must be valid"
+    days = get_ordinals_from_dates(years, months, days)
+    return (((days * 24 + hours) * 60 + mins) * 60 + secs) * 1000 + msecs
+
+
+def get_date_time_from_msecs_array(msecs):
+    "Get date-time arrays of miliseconds since 0000-01-01 00:00:00.000"
+    days, msecs = numpy.divmod(numpy.asarray(msecs, dtype=numpy.int64), datetimeext._MSECS_IN_DAY)
+    hours, msecs = numpy.divmod(msecs, datetimeext._MSECS_IN_HOUR)
+    mins, msecs = numpy.divmod(msecs, datetimeext._MSECS_IN_MINUTE)
+    secs, msecs = numpy.divmod(msecs, 1000)
+    return get_dates_from_ordinals(days) + (hours, mins, secs, msecs)
+
+
+def get_date_string_formated_array(format="YYYY-MM-DD", years=0, months=1, days=1):
+    "Get array of formated strings of dates, the same as get_date_string_formated returns"
+    years, months, days = [numpy.asarray(values).astype(str) for values in (years, months, days)]
+    if format == "yyyY-mM-dD":
+        return _join_strings(years, '-', months, '-', days)
+    months = numpy.char.zfill(months, 2)
+    days = numpy.char.zfill(days, 2)
+    if format == "YYYYMMDD":
+        return _join_strings(years, months, days)
+    return _join_strings(years, '-', months, '-', days)
+
+
+def get_time_string_formated_array(form="HH:MM:SS.MSS", hours=0, mins=0, secs=0, msecs=0):
+    "Get array of formated strings of times, the same as get_time_string_formated returns"
+    hours, mins, secs, msecs = [numpy.asarray(values).astype(str) for values in (hours, mins, secs, msecs)]
+    if form == "hH:hM":
+        return _join_strings(hours, ':', mins)
+    if form == "hH:hM:sS.msS":
+        return _join_strings(hours, ':', mins, ':', secs, '.', msecs)
+    hours = numpy.char.zfill(hours, 2)
+    mins = numpy.char.zfill(mins, 2)
+    if form == "HH:MM":
+        return _join_strings(hours, ':', mins)
+    return _join_strings(hours, ':', mins, ':', numpy.char.zfill(secs, 2), '.', numpy.char.zfill(msecs, 3))
+
+
+def _join_strings(*parts):
+    strings = parts[0]
+    for part in parts[1:]:
+        strings = numpy.char.add(strings, part)
+    return strings
+
+
+class DateTimeArray:
+    "Array of date-time values with batch functionality of DateTimeExt"
+    __slots__ = ('_msecs',)
+
+    def __init__(self, msecs=()):
+        "msecs - miliseconds since 0000-01-01 00:00:00.000 (array-like or DateTimeExt objects)"
+        assert numpy is not None, "NumPy is not installed"
+        if isinstance(msecs, DateTimeArray):
+            msecs = msecs._msecs
+        elif not isinstance(msecs, numpy.ndarray):
+            msecs = [value.get_msecs() if isinstance(value, DateTimeExt) else value for value in msecs]
+        self._msecs = numpy.array(msecs, dtype=numpy.int64).reshape(-1)
+
+    @classmethod
+    def from_date_time(cls, year=0, month=1, day=1, hour=0, min=0, sec=0, msec=0):
+        "Make array of date-time values arrays, values are checked as by DateTimeExt.set_date_time"
+        assert numpy is not None, "NumPy is not installed"
+        assert numpy.all(check_date_time_array(year, month, day, hour, min, sec, msec)), \
+            'Wrong value of date-time'
+        return cls(get_msecs_from_date_time_array(year, month, day, hour, min, sec, msec))
+
+    def __len__(self):
+        return len(self._msecs)
+
+    def __getitem__(self, key):
+        "Get DateTimeExt by index or DateTimeArray by slice or mask"
+        if isinstance(key, (int, numpy.integer)):
+            return DateTimeExt(int(self._msecs[key]))
+        return DateTimeArray(self._msecs[key])
+
+    def __sub__(self, other):
+        "Get array of miliseconds from other date-times (DateTimeArray or DateTimeExt) to these ones"
+        if isinstance(other, DateTimeExt):
+            return self._msecs - other.get_msecs()
+        if isinstance(other, DateTimeArray):
+            return self._msecs - other._msecs
+        return NotImplemented
+
+    def get_msecs(self):
+        "Get array of miliseconds since 0000-01-01 00:00:00.000, shared with this object"
+        return self._msecs
+
+    def get_date_time(self):
+        "Get datetime items arrays"
+        return get_date_time_from_msecs_array(self._msecs)
+
+    def get_year(self):
+        "Get Year values"
+        return self.get_date_time()[0]
+
+    def get_month(self):
+        "Get Month values"
+        return self.get_date_time()[1]
+
+    def get_day(self):
+        "Get Day values"
+        return get_dates_from_ordinals(self._msecs // datetimeext._MSECS_IN_DAY)[2]
+
+    def get_hours(self):
+        "Get Hours values"
+        return self._msecs % datetimeext._MSECS_IN_DAY // datetimeext._MSECS_IN_HOUR
+
+    def get_minutes(self):
+        "Get Minutes values"
+        return self._msecs % datetimeext._MSECS_IN_HOUR // datetimeext._MSECS_IN_MINUTE
+
+    def get_seconds(self):
+        "Get Seconds values"
+        return self._msecs % datetimeext._MSECS_IN_MINUTE // 1000
+
+    def get_miliseconds(self):
+        "Get Miliseconds values"
+        return self._msecs % 1000
+
+    def get_date_string_formated(self, form="YYYY-MM-DD"):
+        "Get array of formated strings of Date (Year, Month, Day)"
+        return get_date_string_formated_array(form, *get_dates_from_ordinals(self._msecs // datetimeext._MSECS_IN_DAY))
+
+    def get_time_string_formated(self, form="HH:MM:SS.MSS"):
+        "Get array of formated strings of Time (Hours, Minutes, Seconds, Miliseconds)"
+        return get_time_string_formated_array(form, self.get_hours(), self.get_minutes(), self.get_seconds(),
+                                              self.get_miliseconds())
+
+    def add_any(self, years=0, months=0, days=0, hours=0, mins=0, secs=0, msecs=0):
+        "Add date-time values (numbers or arrays) counting from any values of arguments"
+        delta = (((numpy.asarray(days, dtype=numpy.int64) * 24 + hours) * 60 + mins) * 60 + secs) * 1000 + msecs
+        if not (numpy.any(years) or numpy.any(months)):
+            self._msecs = self._msecs + delta   # the same length of days, no calendar normalization
+            return
+        year, month, day, hour, min, sec, msec = self.get_date_time()
+        year, month = numpy.divmod(year * 12 + (month - 1) + numpy.asarray(years, dtype=numpy.int64) * 12 + months, 12)
+        days = get_ordinals_from_dates(year, month + 1, day)     # day over days in month goes to next month
+        self._msecs = ((((days * 24 + hour) * 60 + min) * 60 + sec) * 1000 + msec + delta).reshape(-1)
+
+    def sub_any(self, years=0, months=0, days=0, hours=0, mins=0, secs=0, msecs=0):
+        "Subtract date-time values (numbers or arrays) counting from any values of arguments"
+        self.add_any(numpy.negative(years), numpy.negative(months), numpy.negative(days), numpy.negative(hours),
+                     numpy.negative(mins), numpy.negative(secs), numpy.negative(msecs))
+
+    def limit_datetime_to_max(self, year=None, month=None, day=None, hour=None, min=None, sec=None, msec=None):
+        "Limit every date-time to specified maximum value, the same as DateTimeExt.limit_datetime_to_max"
+        self._limit_datetime((year, month, day, hour, min, sec, msec), numpy.less)
+
+    def limit_datetime_to_min(self, year=None, month=None, day=None, hour=None, min=None, sec=None, msec=None):
+        "Limit every date-time to specified minimum value, the same as DateTimeExt.limit_datetime_to_min"
+        self._limit_datetime((year, month, day, hour, min, sec, msec), numpy.greater)
+
+    def _limit_datetime(self, limits, is_inside):
+        """Fields are compared from year to miliseconds, date-time is set to limit field by field
+        until its field is inside of limit, day is limited by days in month if year or month is set"""
+        checks = (None, (check_month_array, 'month'), None, (check_hours_array, 'hours'),
+                  (check_minutes_array, 'minutes'), (check_seconds_array, 'seconds'),
+                  (check_miliseconds_array, 'miliseconds'))
+        fields = list(self.get_date_time())
+        active = numpy.ones(len(self._msecs), dtype=bool)
+        for i, limit in enumerate(limits):
+            if limit is None:
+                continue
+            active &= ~is_inside(fields[i], limit)
+            if checks[i] is not None:
+                assert numpy.all(checks[i][0](limit) | ~active), 'Wrong value of ' + checks[i][1]
+            fields[i] = numpy.where(active, limit, fields[i])
+            if i <= 1:
+                fields[2] = numpy.where(active, numpy.minimum(fields[2], get_days_in_months(fields[0], fields[1])),
+                                        fields[2])
+            elif i == 2:
+                assert numpy.all(check_day_array(fields[2], fields[0], fields[1]) | ~active), 'Wrong value of day'
+        self._msecs = get_msecs_from_date_time_array(*fields).reshape(-1)
@@ -3,12 +3,47 @@
 # @author Sielskyi Leonid (sielskyi)
 #
 
+import array
+import functools
+import operator
+import re
+
 _DAYS_IN_MONTH = [-1, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+_DAYS_BEFORE_MONTH = [-1, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
+_DAYS_IN_MONTH_LEAP = [-1, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+_DAYS_BEFORE_MONTH_LEAP = [-1, 0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335]
+_DAYS_IN_MONTH_TABLES = (_DAYS_IN_MONTH, _DAYS_IN_MONTH_LEAP)              # by leap year flag
+_DAYS_BEFORE_MONTH_TABLES = (_DAYS_BEFORE_MONTH, _DAYS_BEFORE_MONTH_LEAP)
+_YEAR_STARTS_CACHE_SIZE = 4096     # years of cached (days before year, leap year flag)
+_DAYS_IN_400_YEARS = 146097
+_DAYS_IN_100_YEARS = 36524
+_DAYS_IN_4_YEARS = 1461
+_MSECS_IN_DAY = 86400000
+_MSECS_IN_HOUR = 3600000
+_MSECS_IN_MINUTE = 60000
+_RANGE_CARRY_STEP_MAX = 28 * _MSECS_IN_DAY    # longer steps can carry days over more than one month
 _LABLES_OF_MONTHS_EN = ['', 'January', 'February', 'March', 'April', 'May', 'June',
                         'Jule', 'August', 'September', 'October', 'November', 'December']
 _SHORT_LABLES_OF_MONTHS_EN = ['', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
                         'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 
+# patterns of formats of get_date_string_formated and get_time_string_formated, other date formats are "YYYY-MM-DD"
+_DATE_FORMATS_RECOMP = {"yyyY-mM-dD": re.compile(r'(-?\d+)-(\d{1,2})-(\d{1,2})', re.ASCII),
+                        "YYYYMMDD": re.compile(r'(-?\d+)(\d\d)(\d\d)', re.ASCII),
+                        "YYYY-MM-DD": re.compile(r'(-?\d+)-(\d\d)-(\d\d)', re.ASCII)}
+_TIME_FORMATS_RECOMP = {"HH:MM": re.compile(r'(\d\d):(\d\d)', re.ASCII),
+                        "hH:hM": re.compile(r'(\d{1,2}):(\d{1,2})', re.ASCII),
+                        "hH:hM:sS.msS": re.compile(r'(\d{1,2}):(\d{1,2}):(\d{1,2})\.(\d{1,3})', re.ASCII),
+                        "HH:MM:SS.MSS": re.compile(r'(\d\d):(\d\d):(\d\d)\.(\d\d\d)', re.ASCII)}
+# fixed width formats (years 1000 - 9999): length, getters of separators and of fields, separators
+_FIXED_FORMATS = {"YYYYMMDD": (8, None, operator.itemgetter(slice(0, 4), slice(4, 6), slice(6, 8)), None),
+                  "YYYY-MM-DD": (10, operator.itemgetter(4, 7),
+                                 operator.itemgetter(slice(0, 4), slice(5, 7), slice(8, 10)), ('-', '-')),
+                  "HH:MM": (5, operator.itemgetter(2), operator.itemgetter(slice(0, 2), slice(3, 5)), ':'),
+                  "HH:MM:SS.MSS": (12, operator.itemgetter(2, 5, 8),
+                                   operator.itemgetter(slice(0, 2), slice(3, 5), slice(6, 8), slice(9, 12)),
+                                   (':', ':', '.'))}
+
 
 def check_year_is_leap(year):
     "year -> 1 if leap year, else 0."
@@ -17,7 +52,7 @@ def check_year_is_leap(year):
 
 def get_days_in_year(year):
     "year -> number of days in that year."
-    if check_year_is_leap(year):
+    if _get_year_start(year)[1]:
         return 366
     return 365
 
@@ -25,9 +60,80 @@ def get_days_in_year(year):
 def get_days_in_month(year, month):
     "year, month -> number of days in that month in that year."
     assert 1 <= month <= 12, month
-    if (month == 2) and (check_year_is_leap(year)):
-        return 29
-    return _DAYS_IN_MONTH[month]
+    return _DAYS_IN_MONTH_TABLES[_get_year_start(year)[1]][month]
+
+
+def get_days_before_year(year):
+    "year -> number of days before that year counting from 0000-01-01 (proleptic Gregorian)."
+    return _get_year_start(year)[0]
+
+
+def get_days_before_month(year, month):
+    "year, month -> number of days in that year before that month."
+    assert 1 <= month <= 12, month
+    return _DAYS_BEFORE_MONTH_TABLES[_get_year_start(year)[1]][month]
+
+
+def get_ordinal_from_date(year, month, day):
+    "year, month, day -> number of days since 0000-01-01."
+    assert 1 <= month <= 12, month
+    start, leap = _get_year_start(year)
+    return start + _DAYS_BEFORE_MONTH_TABLES[leap][month] + day - 1
+
+
+def get_day_of_year(year, month, day):
+    "year, month, day -> number of day in that year starting from 1."
+    return get_days_before_month(year, month) + day
+
+
+def get_day_of_week(year, month, day):
+    "year, month, day -> ISO day of week, 1 - Monday .. 7 - Sunday."
+    return (get_ordinal_from_date(year, month, day) + 5) % 7 + 1      # 0000-01-01 is Saturday
+
+
+def get_iso_week(year, month, day):
+    "year, month, day -> (ISO year, ISO week number, ISO day of week)."
+    ordinal = get_ordinal_from_date(year, month, day)
+    weekday = (ordinal + 5) % 7 + 1
+    week_year = year
+    monday = _get_iso_year_start(year)
+    if ordinal < monday:
+        week_year -= 1
+        monday = _get_iso_year_start(week_year)
+    elif ordinal >= _get_iso_year_start(year + 1):
+        week_year += 1
+        monday = _get_iso_year_start(week_year)
+    return (week_year, (ordinal - monday) // 7 + 1, weekday)
+
+
+@functools.lru_cache(maxsize=_YEAR_STARTS_CACHE_SIZE)
+def _get_year_start(year):
+    "year -> (number of days before that year counting from 0000-01-01, leap year flag)."
+    y = year - 1
+    return (year * 365 + y // 4 - y // 100 + y // 400 + 1, check_year_is_leap(year))    # year 0 is leap
+
+
+def _get_iso_year_start(year):
+    "year -> number of days before Monday of the first ISO week (week of January 4) of that year."
+    jan4 = _get_year_start(year)[0] + 3
+    return jan4 - (jan4 + 5) % 7
+
+
+def get_date_from_ordinal(ordinal):
+    "number of days since 0000-01-01 -> (year, month, day)."
+    n400, n = divmod(ordinal - 366, _DAYS_IN_400_YEARS)    # cycles of 400 years from 0001-01-01
+    n100, n = divmod(n, _DAYS_IN_100_YEARS)
+    n4, n = divmod(n, _DAYS_IN_4_YEARS)
+    n1, n = divmod(n, 365)
+    year = n400 * 400 + n100 * 100 + n4 * 4 + n1 + 1
+    if (n1 == 4) or (n100 == 4):
+        return (year - 1, 12, 31)   # the last day of leap year ending the cycle
+
+    before = _DAYS_BEFORE_MONTH_TABLES[(n1 == 3) and ((n4 != 24) or (n100 == 3))]
+    month = (n + 50) >> 5           # estimate is the month or the next month
+    if before[month] > n:
+        month -= 1
+    return (year, month, n - before[month] + 1)
 
 
 def get_month_lable(month):
@@ -171,238 +277,426 @@ def get_time_string_formated(form="HH:MM:SS.MSS", hour=0, min=0, sec=0, msec=0):
         timestr += str(msec)
     return timestr
 
+def get_date_from_string(string, format="YYYY-MM-DD"):
+    "Get (Year, Month, Day) of string formated by get_date_string_formated, ValueError if it is wrong"
+    match = _DATE_FORMATS_RECOMP.get(format, _DATE_FORMATS_RECOMP["YYYY-MM-DD"]).fullmatch(string)
+    if match is None:
+        raise ValueError('Wrong date string ' + repr(string))
+    return _check_date_values((int(match.group(1)), int(match.group(2)), int(match.group(3))))
+
+
+def get_time_from_string(string, form="HH:MM:SS.MSS"):
+    "Get (Hours, Minutes, Seconds, Miliseconds) of string formated by get_time_string_formated"
+    match = _TIME_FORMATS_RECOMP.get(form, _TIME_FORMATS_RECOMP["HH:MM:SS.MSS"]).fullmatch(string)
+    if match is None:
+        raise ValueError('Wrong time string ' + repr(string))
+    values = tuple(int(value) for value in match.groups())
+    return _check_time_values(values + (0, 0) if len(values) == 2 else values)
+
+
+def parse_many(strings, format="YYYY-MM-DD"):
+    """Generate values of strings (iterable like file lines) formated by get_date_string_formated
+    or by get_time_string_formated for time formats, the same as get_*_from_string return.
+    Strings of fixed width formats are split by positions without patterns matching."""
+    istime = format in _TIME_FORMATS_RECOMP
+    parse = get_time_from_string if istime else get_date_from_string
+    check = _check_time_values if istime else _check_date_values
+    fixed = _FIXED_FORMATS.get(format)
+    if fixed is None:
+        for string in strings:
+            yield parse(string.rstrip('\r\n'), format)
+        return
+
+    length, get_separators, get_fields, separators = fixed
+    for string in strings:
+        if len(string) != length:
+            string = string.rstrip('\r\n')
+        if (len(string) == length) and ((get_separators is None) or (get_separators(string) == separators)):
+            fields = get_fields(string)
+            if ''.join(fields).isdigit() and string.isascii():
+                values = tuple(map(int, fields))
+                yield check(values + (0, 0) if len(values) == 2 else values)
+                continue
+        yield parse(string.rstrip('\r\n'), format)    # other width of year or wrong string
+
+
+def _check_date_values(values):
+    if not check_month(values[1]):
+        raise ValueError('Wrong value of month')
+    if not check_day(values[2], values[0], values[1]):
+        raise ValueError('Wrong value of day')
+    return values
+
+
+def _check_time_values(values):
+    if not check_hours(values[0]):
+        raise ValueError('Wrong value of hours')
+    if not check_minutes(values[1]):
+        raise ValueError('Wrong value of minutes')
+    if not check_seconds(values[2]):
+        raise ValueError('Wrong value of seconds')
+    if not check_miliseconds(values[3]):
+        raise ValueError('Wrong value of miliseconds')
+    return values
+
+
 def get_real_from_any(years=0, months=0, days=0, hours=0, mins=0, secs=0, msecs=0):
-    "Get real date-time values counting from any values of arguments"
-    secs += int(msecs / 1000)
-    msecs %= 1000
-    mins += int(secs / 60)
-    secs %= 60
-    hours += int(mins / 60)
-    mins %= 60
-    days += int(hours / 24)
-    hours %= 24
+    "Get real date-time values counting from any values of arguments (months and days from 0)"
+    carry, msecs = divmod(msecs, 1000)
+    carry, secs = divmod(secs + carry, 60)
+    carry, mins = divmod(mins + carry, 60)
+    carry, hours = divmod(hours + carry, 24)
+    days += carry
+    carry, months = divmod(months, 12)
+    years, months, days = get_date_from_ordinal(get_ordinal_from_date(years + carry, months + 1, 1) + days)
+    return (years, months, days, hours, mins, secs, msecs)
+
 
+def get_msecs_from_date_time(year=0, month=1, day=1, hour=0, min=0, sec=0, msec=0):
+    "Get miliseconds since 0000-01-01 00:00:00.000 of date-time"
+    return ((((get_ordinal_from_date(year, month, day) * 24 + hour) * 60 + min) * 60 + sec) * 1000 + msec)
+
+
+def get_date_time_from_msecs(msecs):
+    "Get date-time values of miliseconds since 0000-01-01 00:00:00.000"
+    days, msecs = divmod(msecs, _MSECS_IN_DAY)
+    hour, msecs = divmod(msecs, _MSECS_IN_HOUR)
+    min, msecs = divmod(msecs, _MSECS_IN_MINUTE)
+    sec, msec = divmod(msecs, 1000)
+    return get_date_from_ordinal(days) + (hour, min, sec, msec)
+
+
+def _generate_date_times(msecs, stop, step):
+    "Generate (miliseconds, date-time values) from msecs to stop (excluded) by step of miliseconds"
+    if not (0 < step < _RANGE_CARRY_STEP_MAX):
+        for msecs in range(msecs, stop, step):
+            yield (msecs, get_date_time_from_msecs(msecs))
+        return
+
+    step_days, rest = divmod(step, _MSECS_IN_DAY)
+    step_hour, rest = divmod(rest, _MSECS_IN_HOUR)
+    step_min, rest = divmod(rest, _MSECS_IN_MINUTE)
+    step_sec, step_msec = divmod(rest, 1000)
+    year, month, day, hour, min, sec, msec = get_date_time_from_msecs(msecs)
+    days_in_month = _DAYS_IN_MONTH_TABLES[check_year_is_leap(year)]
+    while msecs < stop:
+        yield (msecs, (year, month, day, hour, min, sec, msec))
+        msecs += step
+        msec += step_msec           # each value carries at most 1 to the next one
+        sec += step_sec
+        if msec >= 1000:
+            msec -= 1000
+            sec += 1
+        min += step_min
+        if sec >= 60:
+            sec -= 60
+            min += 1
+        hour += step_hour
+        if min >= 60:
+            min -= 60
+            hour += 1
+        day += step_days
+        if hour >= 24:
+            hour -= 24
+            day += 1
+        if day > days_in_month[month]:
+            day -= days_in_month[month]
+            month += 1
+            if month > 12:
+                month = 1
+                year += 1
+                days_in_month = _DAYS_IN_MONTH_TABLES[check_year_is_leap(year)]
+
+
+def _generate_date_times_by_calendar(msecs, stop, years, months, days, hours, mins, secs, msecs_step):
+    "Generate (miliseconds, date-time values) from msecs to stop (excluded) adding values like add_any"
+    fields = get_date_time_from_msecs(msecs)
+    forward = None
     while True:
-        years += int(months / 12)
-        months %= 12
-        if months == 0:
-            while True:
-                days_in_year = get_days_in_year(years)
-                if days >= days_in_year:
-                    days -= days_in_year
-                    years += 1
-                else:
-                    break
-        days_in_month = get_days_in_month(years, (months + 1))
-        if days >= days_in_month:
-            days -= days_in_month
-            months += 1
-        else:
-            break
+        year, month, day, hour, min, sec, msec = fields
+        fields = get_real_from_any(year + years, month + months - 1, day + days - 1, hour + hours, min + mins,
+                                   sec + secs, msec + msecs_step)
+        following = get_msecs_from_date_time(*fields)
+        if forward is None:
+            assert (following != msecs), 'Step of range is zero'
+            forward = following > msecs
+        if (msecs >= stop) if forward else (msecs <= stop):
+            return
+        yield (msecs, (year, month, day, hour, min, sec, msec))
+        msecs = following
 
-    days += 1
-    months += 1
-    return (years, months, days, hours, mins, secs, msecs)
 
 class DateTimeExt:
     "Class of extended functionality for date and time"
-    _year = 0
-    _month = 1
-    _day = 1
-    _hour = 0
-    _min = 0
-    _sec = 0
-    _msec = 0
-
-    def __init__(self):
-        _year = 0
-        _month = 1
-        _day = 1
-        _hour = 0
-        _min = 0
-        _sec = 0
-        _msec = 0
+    __slots__ = ('_msecs', '_fields')
+
+    def __init__(self, msecs=0):
+        "msecs - miliseconds since 0000-01-01 00:00:00.000"
+        self._msecs = msecs
+        self._fields = None             # date-time values computed on demand
+
+    def __eq__(self, other):
+        if not isinstance(other, DateTimeExt):
+            return NotImplemented
+        return self._msecs == other._msecs
+
+    def __ne__(self, other):
+        if not isinstance(other, DateTimeExt):
+            return NotImplemented
+        return self._msecs != other._msecs
+
+    def __lt__(self, other):
+        if not isinstance(other, DateTimeExt):
+            return NotImplemented
+        return self._msecs < other._msecs
+
+    def __le__(self, other):
+        if not isinstance(other, DateTimeExt):
+            return NotImplemented
+        return self._msecs <= other._msecs
+
+    def __gt__(self, other):
+        if not isinstance(other, DateTimeExt):
+            return NotImplemented
+        return self._msecs > other._msecs
+
+    def __ge__(self, other):
+        if not isinstance(other, DateTimeExt):
+            return NotImplemented
+        return self._msecs >= other._msecs
+
+    def __hash__(self):
+        return hash(self._msecs)
+
+    def __sub__(self, other):
+        "Get miliseconds from other date-time to this one"
+        if not isinstance(other, DateTimeExt):
+            return NotImplemented
+        return self._msecs - other._msecs
+
+    def __repr__(self):
+        return 'DateTimeExt' + repr(self.get_date_time())
+
+    def get_msecs(self):
+        "Get miliseconds since 0000-01-01 00:00:00.000"
+        return self._msecs
+
+    def set_msecs(self, msecs):
+        "Set miliseconds since 0000-01-01 00:00:00.000"
+        self._msecs = msecs
+        self._fields = None
 
     def get_date_time(self):
         "Get datetime items"
-        return (self._year, self._month, self._day, self._hour, self._min, self._sec, self._msec)
+        if self._fields is None:
+            self._fields = get_date_time_from_msecs(self._msecs)
+        return self._fields
 
     def get_year(self):
         "Get Year value"
-        return self._year
+        return self.get_date_time()[0]
 
     def get_month(self):
         "Get Month value"
-        return self._month
+        return self.get_date_time()[1]
 
     def get_day(self):
         "Get Day value"
-        return self._day
+        return self.get_date_time()[2]
 
     def get_hours(self):
         "Get Hours value"
-        return self._hour
+        return self.get_date_time()[3]
 
     def get_minutes(self):
         "Get Minutes value"
-        return self._min
+        return self.get_date_time()[4]
 
     def get_seconds(self):
         "Get Seconds value"
-        return self._sec
+        return self.get_date_time()[5]
 
     def get_miliseconds(self):
         "Get Miliseconds value"
-        return self._msecs
+        return self.get_date_time()[6]
+
+    def get_day_of_year(self):
+        "Get number of day in the year starting from 1"
+        return get_day_of_year(*self.get_date_time()[:3])
+
+    def get_day_of_week(self):
+        "Get ISO day of week, 1 - Monday .. 7 - Sunday"
+        return (self._msecs // _MSECS_IN_DAY + 5) % 7 + 1
+
+    def get_iso_week(self):
+        "Get (ISO year, ISO week number, ISO day of week)"
+        return get_iso_week(*self.get_date_time()[:3])
 
     def get_date_string_formated(self, form="YYYY-MM-DD"):
         "Get formated string of Date (Year, Month, Day)"
-        return get_date_string_formated(form, self._year, self._month, self._day)
+        return get_date_string_formated(form, *self.get_date_time()[:3])
 
     def get_time_string_formated(self, form="HH:MM:SS.MSS"):
         "Get formated string of Time (Hours, Minutes, Seconds, Miliseconds)"
-        return get_time_string_formated(form, self._hour, self._min, self._sec, self._msec)
+        return get_time_string_formated(form, *self.get_date_time()[3:])
 
     def set_date_time(self, year=0, month=1, day=1, hour=0, min=0, sec=0, msec=0):
         "Set datetime items"
         self.modify_date_time(year, month, day, hour, min, sec, msec)
-        
+
     def modify_date_time(self, year=None, month=None, day=None, hour=None, min=None, sec=None, msec=None):
-        "Modify datetime to specified values"
+        "Modify datetime to specified values, day is limited by days in month if only year or month is changed"
+        fields = list(self.get_date_time())
         if year is not None:
-            self._year = year
+            fields[0] = year
         if month is not None:
             assert (check_month(month)), 'Wrong value of month'
-            self._month = month
+            fields[1] = month
         if day is not None:
-            assert (check_day(day, self._year, self._month)), 'Wrong value of day'
-            self._day = day
+            assert (check_day(day, fields[0], fields[1])), 'Wrong value of day'
+            fields[2] = day
+        elif not check_day(fields[2], fields[0], fields[1]):
+            fields[2] = get_days_in_month(fields[0], fields[1])
         if hour is not None:
             assert (check_hours(hour)), 'Wrong value of hours'
-            self._hour = hour
+            fields[3] = hour
         if min is not None:
             assert (check_minutes(min)), 'Wrong value of minutes'
-            self._min = min
+            fields[4] = min
         if sec is not None:
             assert (check_seconds(sec)), 'Wrong value of seconds'
-            self._sec = sec
+            fields[5] = sec
         if msec is not None:
             assert (check_miliseconds(msec)), 'Wrong value of miliseconds'
-            self._msec = msec
+            fields[6] = msec
+        self._msecs = get_msecs_from_date_time(*fields)
+        self._fields = tuple(fields)
 
     def limit_datetime_to_max(self, year=None, month=None, day=None, hour=None, min=None, sec=None, msec=None):
         "Limit date-time to specified maximum value"
         if year is not None:
-            if self._year < year:
+            if self.get_year() < year:
                 return
             self.modify_date_time(year=year)
         if month is not None:
-            if self._month < month:
+            if self.get_month() < month:
                 return
             self.modify_date_time(month=month)
         if day is not None:
-            if self._day < day:
+            if self.get_day() < day:
                 return
             self.modify_date_time(day=day)
         if hour is not None:
-            if self._hour < hour:
+            if self.get_hours() < hour:
                 return
             self.modify_date_time(hour=hour)
         if min is not None:
-            if self._min < min:
+            if self.get_minutes() < min:
                 return
             self.modify_date_time(min=min)
         if sec is not None:
-            if self._sec < sec:
+            if self.get_seconds() < sec:
                 return
             self.modify_date_time(sec=sec)
         if msec is not None:
-            if self._msec < msec:
+            if self.get_miliseconds() < msec:
                 return
             self.modify_date_time(msec=msec)
 
     def limit_datetime_to_min(self, year=None, month=None, day=None, hour=None, min=None, sec=None, msec=None):
         "Limit date-time to specified minimum value"
         if year is not None:
-            if self._year > year:
+            if self.get_year() > year:
                 return
             self.modify_date_time(year=year)
         if month is not None:
-            if self._month > month:
+            if self.get_month() > month:
                 return
             self.modify_date_time(month=month)
         if day is not None:
-            if self._day > day:
+            if self.get_day() > day:
                 return
             self.modify_date_time(day=day)
         if hour is not None:
-            if self._hour > hour:
+            if self.get_hours() > hour:
                 return
             self.modify_date_time(hour=hour)
         if min is not None:
-            if self._min > min:
+            if self.get_minutes() > min:
                 return
             self.modify_date_time(min=min)
         if sec is not None:
-            if self._sec > sec:
+            if self.get_seconds() > sec:
                 return
             self.modify_date_time(sec=sec)
         if msec is not None:
-            if self._msec > msec:
+            if self.get_miliseconds() > msec:
                 return
             self.modify_date_time(msec=msec)
 
     def add_any(self, years=0, months=0, days=0, hours=0, mins=0, secs=0, msecs=0):
         "Add date-time values counting from any values of arguments"
-        self.set_from_any((self._year + years), (self._month + months - 1), (self._day + days - 1),
-                          (self._hour + hours), (self._min + mins), (self._sec + secs), (self._msec + msecs))
+        if (years == 0) and (months == 0):  # the same length of days, no calendar normalization
+            self.set_msecs(self._msecs + (((days * 24 + hours) * 60 + mins) * 60 + secs) * 1000 + msecs)
+            return
+        year, month, day, hour, min, sec, msec = self.get_date_time()
+        self.set_from_any((year + years), (month + months - 1), (day + days - 1),
+                          (hour + hours), (min + mins), (sec + secs), (msec + msecs))
 
     def sub_any(self, years=0, months=0, days=0, hours=0, mins=0, secs=0, msecs=0):
         "Subtract date-time values counting from any values of arguments"
-        years, months, days, hours, mins, secs, msecs = get_real_from_any(years, months, days, hours, mins, secs, msecs)
-
-        if self._msec < msecs:
-            self._msec += 1000 - msecs
-            secs += 1
-            years, months, days, hours, mins, secs, msecs = get_real_from_any(years, months, days, hours, mins, secs,
-                                                                              msecs)
-        else:
-            self._msec -= msecs
-        if self._sec < secs:
-            self._sec += 60 - secs
-            mins += 1
-            years, months, days, hours, mins, secs, msecs = get_real_from_any(years, months, days, hours, mins, secs,
-                                                                              msecs)
-        else:
-            self._sec -= secs
-        if self._min < mins:
-            self._min += 60 - mins
-            hours += 1
-            years, months, days, hours, mins, secs, msecs = get_real_from_any(years, months, days, hours, mins, secs,
-                                                                              msecs)
-        else:
-            self._min -= mins
-        if self._hour < hours:
-            self._hour += 24 - hours
-            days += 1
-            years, months, days, hours, mins, secs, msecs = get_real_from_any(years, months, days, hours, mins, secs,
-                                                                              msecs)
-        else:
-            self._hour -= hours
-        if self._hour < hours:
-            self._hour += 24 - hours
-            days += 1
-            years, months, days, hours, mins, secs, msecs = get_real_from_any(years, months, days, hours, mins, secs,
-                                                                              msecs)
+        self.add_any(-years, -months, -days, -hours, -mins, -secs, -msecs)
+
+    @classmethod
+    def range(cls, start, stop, step=_MSECS_IN_MINUTE, date_form=None, time_form=None, packed=False):
+        """Generate date-times from start to stop (excluded) like repeated add_any, values are carried
+        from the previous date-time instead of computing each one again.
+        start, stop - DateTimeExt or miliseconds since 0000-01-01 00:00:00.000
+        step - miliseconds or tuple of add_any values (years, months, days, hours, mins, secs, msecs)
+        date_form, time_form - generate strings of get_*_string_formated (separated by space) instead
+        packed - return array('q') of miliseconds of all date-times instead of generator"""
+        start = start.get_msecs() if isinstance(start, DateTimeExt) else start
+        stop = stop.get_msecs() if isinstance(stop, DateTimeExt) else stop
+        if isinstance(step, tuple):
+            step = tuple(step) + (0,) * (7 - len(step))
+            if (step[0] == 0) and (step[1] == 0):     # the same length of days, no calendar normalization
+                step = (((step[2] * 24 + step[3]) * 60 + step[4]) * 60 + step[5]) * 1000 + step[6]
+        assert (step != 0), 'Step of range is zero'
+        if packed:
+            assert (date_form is None) and (time_form is None), 'Packed range is not formated'
+            if isinstance(step, tuple):
+                items = _generate_date_times_by_calendar(start, stop, *step)
+                return array.array('q', (msecs for msecs, fields in items))
+            return array.array('q', range(start, stop, step))
+        return cls._generate_range(start, stop, step, date_form, time_form)
+
+    @classmethod
+    def _generate_range(cls, start, stop, step, date_form, time_form):
+        "Generator of range method"
+        if isinstance(step, tuple):
+            items = _generate_date_times_by_calendar(start, stop, *step)
+        elif (date_form is None) and (time_form is None):
+            for msecs in range(start, stop, step):
+                yield cls(msecs)            # values are computed on demand
+            return
         else:
-            self._hour -= hours
-        if self._day < days:
-            self._day += 24 - hours
-            days += 1
-            years, months, days, hours, mins, secs, msecs = get_real_from_any(years, months, days, hours, mins, secs,
-                                                                              msecs)
+            items = _generate_date_times(start, stop, step)
+
+        if (date_form is None) and (time_form is None):
+            for msecs, fields in items:
+                dte = cls(msecs)
+                dte._fields = fields
+                yield dte
+        elif time_form is None:
+            for msecs, fields in items:
+                yield get_date_string_formated(date_form, fields[0], fields[1], fields[2])
+        elif date_form is None:
+            for msecs, fields in items:
+                yield get_time_string_formated(time_form, fields[3], fields[4], fields[5], fields[6])
         else:
-            self._hour -= hours
+            for msecs, fields in items:
+                yield (get_date_string_formated(date_form, fields[0], fields[1], fields[2]) + ' ' +
+                       get_time_string_formated(time_form, fields[3], fields[4], fields[5], fields[6]))
 
     def set_from_any(self, years=0, months=0, days=0, hours=0, mins=0, secs=0, msecs=0):
         "Get date-time values counting from any values of arguments"
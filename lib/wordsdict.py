@@ -32,8 +32,32 @@
 # 0x0000NNNNNN000000 - 0x0000NNNNNNFFFFFF   - Words starts with symbol with UTF-8 code 0xNNNNNN
 #
 
+import argparse
+import array
+import contextlib
+import functools
+import hashlib
+import math
+import mmap
+import multiprocessing
+import numbers
 import os
 import re
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None                    # no locking of shards for other processes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None                    # encoded texts are array.array only
 
 _WORDS_PER_TYPE_MAX = 0x01000000
 _INTEGER_MIN = 0
@@ -43,30 +67,337 @@ _WORD_EMPTY = 0x20000000
 _WORD_TEXT_START = 0x20000002
 _WORD_TEXT_END = 0x20000003
 _WORD_IN_FILE_START = 0x21000000
+_WORD_IN_FILE_UINT32_MAX = 0xFF * _WORDS_PER_TYPE_MAX     # the first index of the last shard of 4 bytes indices
+
+_WORD_TYPE_TEXT = 0                 # word of letters, like "don't", "rock&roll"
+_WORD_TYPE_DIGIT = 1                # word starting with digit, like "3rd", "50%"
+_WORD_TYPE_NUMBER = 2               # word of number sign and digit, like "#1st"
+
+_WORDS_DICT_DATA_DIR = '../data/wordsdict'    # default data directory of WordsDict objects
+_WORDS_DICT_SPLIT_FILE = 'wd_split.csv'    # symbols of shards split to files by the second symbol of word
+
+_BLANK_RECOMP = re.compile(r'\s')      # pattern for all blank symbols
+# pattern of a single word, every word type has own group, the first matched group wins
+_WORD_RECOMP = re.compile(r"(?P<digit>\d\w+|\d\w*\'\w+|\d\w*-\w+|\d\w*%)|"
+                          r"(?P<number>#\d\w+|#\d\w*\'\w+|#\d\w*-\w+)|"
+                          r"(?P<text>\w+|\w+-\w+|\w+\'\w+|\w+\'\w+\'\w+|\w+-\w+-\w+|\w+&\w+)")
+_WORD_TYPES = {'text': _WORD_TYPE_TEXT, 'digit': _WORD_TYPE_DIGIT, 'number': _WORD_TYPE_NUMBER}
+
+# Binary shard 'wd_0xNN.bin' (converted from 'wd_0xNN.csv'):
+# header, records of key offset and index sorted by key, keys of length and 'word\tlang' UTF-8 bytes
+_BIN_MAGIC = b'WDB1'
+_BIN_HEADER = struct.Struct('<4sIQQ')   # magic, number of records, size of converted csv, last index
+_BIN_RECORD = struct.Struct('<IQ')      # key offset, index
+_BIN_KEY_LEN = struct.Struct('<I')
+
+# Bloom filter of words of shard 'wd_0xNN.bloom' (next to 'wd_0xNN.csv'): header and bits
+_BLOOM_MAGIC = b'WDF1'
+_BLOOM_HEADER = struct.Struct('<4sIQQQQ')    # magic, number of hashes, number of bits, capacity, words, csv size
+_BLOOM_CAPACITY_MIN = 1024                  # words of the smallest filter, capacity is doubled when it is full
+
+# Counters of WordsDict stats and public methods timed by it
+_STATS_COUNTERS = ('files_opened', 'lines_scanned', 'bytes_read', 'bytes_written', 'words_allocated')
+_STATS_METHODS = ('get_word_index', 'check_word', 'get_word_indices', 'encode_text',
+                  'get_word_by_index', 'decode', 'format_words', 'flush')
+
+# Encoded text file: magic, typecode of array.array ('I' or 'Q'), little-endian indices
+_ENCODED_MAGIC = b'WDE'
+
+
+def save_encoded(filepath, encoded):
+    """Save encoded text (array.array or numpy array of 4 or 8 bytes unsigned integers) to file"""
+    data = memoryview(encoded)
+    assert data.itemsize in (4, 8), "Encoded text items are not 4 or 8 bytes integers"
+    typecode = 'I' if data.itemsize == 4 else 'Q'
+    if sys.byteorder == 'big':
+        encoded = array.array(typecode, data.tobytes())
+        encoded.byteswap()
+        data = memoryview(encoded)
+    with open(filepath, 'wb') as wfile:
+        wfile.write(_ENCODED_MAGIC + typecode.encode('ascii'))
+        wfile.write(data.cast('B'))
 
-_WORDS_DICT_DATA_DIR = '../data/wordsdict'
+
+def load_encoded(filepath, as_numpy=False):
+    """Load encoded text saved by save_encoded to array.array or numpy array if as_numpy"""
+    with open(filepath, 'rb') as rfile:
+        header = rfile.read(len(_ENCODED_MAGIC) + 1)
+        assert header[:-1] == _ENCODED_MAGIC, "Wrong encoded text file " + filepath
+        typecode = header[-1:].decode('ascii')
+        if as_numpy:
+            assert numpy is not None, "NumPy is not installed"
+            return numpy.fromfile(rfile, dtype=('<u4' if typecode == 'I' else '<u8'))
+        encoded = array.array(typecode, rfile.read())
+    if sys.byteorder == 'big':
+        encoded.byteswap()
+    return encoded
+
+
+class _ShardIndex(dict):
+    """Shard loaded to dict by (word, lang) key"""
+    offset = 0                      # bytes of shard file already read
+
+
+class _PendingLines(dict):
+    """New lines of shard not written yet, dict by (word, lang) key"""
+
+    def __init__(self):
+        dict.__init__(self)
+        self.lines = []
+
+
+class _ShardWords(dict):
+    """Words of shard by position of index counting from the first index of shard words type"""
+    offset = 0                      # bytes of shard file already read
+
+
+class _BinShard:
+    """Memory mapped binary shard searched without loading, dict-like by (word, lang) key.
+    Words appended to csv shard after the conversion are kept in tail dict."""
+
+    def __init__(self, csvpath):
+        self.binpath = csvpath[:-4] + '.bin'
+        self.count = 0
+        self.offset = 0                 # bytes of csv shard already read to binary shard or tail
+        self.mark = None                # (last index, csv bytes) for next index of shard
+        self.tail = {}
+        self._map = None
+        try:
+            with open(self.binpath, 'rb') as rfile:
+                self._map = mmap.mmap(rfile.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return
+        magic, self.count, self.offset, lastindex = _BIN_HEADER.unpack_from(self._map, 0)
+        assert magic == _BIN_MAGIC, "Wrong binary shard file " + self.binpath
+        self.mark = (lastindex, self.offset)
+
+    def get(self, key, default=None):
+        index = self._search(key[0].encode('utf-8') + b'\t' + key[1].encode('utf-8'))
+        if index is None:
+            index = self.tail.get(key, default)
+        return index
+
+    def setdefault(self, key, index):
+        oldindex = self.get(key)
+        if oldindex is None:
+            self.tail[key] = oldindex = index
+        return oldindex
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _search(self, key):
+        lo = 0
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            keyoffset, index = _BIN_RECORD.unpack_from(self._map, _BIN_HEADER.size + mid * _BIN_RECORD.size)
+            start = keyoffset + _BIN_KEY_LEN.size
+            midkey = self._map[start:start + _BIN_KEY_LEN.unpack_from(self._map, keyoffset)[0]]
+            if midkey < key:
+                lo = mid + 1
+            elif midkey > key:
+                hi = mid
+            else:
+                return index
+        return None
+
+
+class _ShardBloom:
+    """Bloom filter of words (of any lang) of shard file"""
+
+    def __init__(self, capacity, fp_rate):
+        self.capacity = capacity
+        self.nbits = self.get_bits_number(capacity, fp_rate)
+        self.nhashes = max(1, round(self.nbits / capacity * math.log(2)))
+        self.bits = bytearray((self.nbits + 7) // 8)
+        self.count = 0                  # words added, repeated words are counted again
+        self.offset = 0                 # bytes of csv shard already added
+        self.dirty = False              # filter is changed after it is read or saved
+
+    @staticmethod
+    def get_bits_number(capacity, fp_rate):
+        return max(64, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+
+    @classmethod
+    def load(cls, filepath):
+        """Read filter from file, None if file does not exist or is broken"""
+        try:
+            with open(filepath, 'rb') as rfile:
+                data = rfile.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < _BLOOM_HEADER.size:
+            return None
+        magic, nhashes, nbits, capacity, count, offset = _BLOOM_HEADER.unpack_from(data, 0)
+        if (magic != _BLOOM_MAGIC) or (len(data) != _BLOOM_HEADER.size + (nbits + 7) // 8):
+            return None
+        bloom = cls.__new__(cls)
+        bloom.capacity, bloom.nbits, bloom.nhashes, bloom.count, bloom.offset = capacity, nbits, nhashes, count, offset
+        bloom.bits = bytearray(data[_BLOOM_HEADER.size:])
+        bloom.dirty = False
+        return bloom
+
+    def save(self, filepath):
+        with open(filepath + '.tmp', 'wb') as wfile:
+            wfile.write(_BLOOM_HEADER.pack(_BLOOM_MAGIC, self.nhashes, self.nbits, self.capacity, self.count,
+                                           self.offset))
+            wfile.write(self.bits)
+        os.replace(filepath + '.tmp', filepath)
+        self.dirty = False
+
+    def add(self, word):
+        bits = self.bits
+        for position in self._get_positions(word):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+        self.dirty = True
+
+    def __contains__(self, word):
+        bits = self.bits
+        for position in self._get_positions(word):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def _get_positions(self, word):
+        """Bits of word by double hashing of stable (the same in every process) hash"""
+        digest = hashlib.blake2b(word.encode('utf-8'), digest_size=16).digest()
+        hash1 = int.from_bytes(digest[:8], 'little')
+        hash2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(hash1 + i * hash2) % self.nbits for i in range(self.nhashes)]
 
 
 class WordsDict:
 
+    def __init__(self, use_index=False, backend='csv', cache_size=0, buffer_size=0, flush_interval=None,
+                 stats=False, stats_callback=None, stats_interval=None, data_dir=None, read_only=False,
+                 bloom_fp_rate=None):
+        """use_index - keep every used shard loaded into a dict keyed by (word, lang)
+        instead of scanning the shard file on each lookup (costs memory per shard)
+        backend - 'csv' to read csv shards, 'bin' to search memory mapped binary shards
+        made by convert_shards_to_bin (words added later are read from csv shards)
+        cache_size - number of the last used words indices kept in cache, 0 - no cache
+        buffer_size - number of new words kept in memory before writing to shards, 0 - write at once
+        flush_interval - maximum seconds to keep new words in memory if buffer_size is set,
+        they are written by timer thread if no more words are added.
+        Buffered words are written by flush, close or at exit of 'with' statement, the object
+        must be the only writer of its shards then. Object can be shared between threads.
+        stats - count shard files I/O, new words and time of public methods (see get_stats),
+        disabled stats cost nothing but a check before each file I/O
+        stats_callback - function called with get_stats() result by export_stats, close and
+        after public method calls once per stats_interval seconds if it is set
+        data_dir - data directory of shards, _WORDS_DICT_DATA_DIR if None
+        read_only - use data directory as an immutable snapshot: nothing is created or written there,
+        get_word_index returns empty word index for unknown words as check_word does, loaded shards
+        are not read again (see preload)
+        bloom_fp_rate - false positive rate of Bloom filters of shards used to reject unknown words
+        without scanning of shard files (use_index is False), None - no filters. Filters are saved
+        to 'wd_0xNN.bloom' files next to shards by flush and close (see get_bloom_stats)"""
+        assert backend in ('csv', 'bin'), "Parameter \'backend\' is not 'csv' or 'bin'"
+        assert not (read_only and buffer_size), "Parameter \'buffer_size\' is set for read only dictionary"
+        assert (bloom_fp_rate is None) or (0 < bloom_fp_rate < 1), "Parameter \'bloom_fp_rate\' is not in (0, 1)"
+        self._data_dir = os.path.abspath(data_dir if data_dir is not None else _WORDS_DICT_DATA_DIR)
+        self._read_only = read_only
+        self._use_index = use_index or (backend == 'bin')
+        self._backend = backend
+        self._shards = {}               # shard file path -> _ShardIndex or _BinShard
+        self._shards_words = {}         # shard file path -> _ShardWords
+        self._paths = {}                # first symbol of word -> shard file path
+        self._marks = {}                # shard file path -> (last index, bytes already read)
+        self._inodes = {}               # shard file path -> inode of shard file read the last time
+        self._shard_locks = {}          # shard file path -> lock of shard for threads
+        self._bloom_fp_rate = bloom_fp_rate
+        self._blooms = {}               # shard file path -> _ShardBloom
+        self._cache_size = cache_size
+        self._cache = OrderedDict()     # (word, lang) -> index, the least recently used first
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._flush_time = time.monotonic()
+        self._flush_timer = None        # daemon timer of flush after flush_interval since the first new word
+        self._pending = {}              # shard file path -> _PendingLines
+        self._pending_count = 0
+        self._lock = threading.Lock()   # lock of cache, pending words counter, stats and shard locks creation
+        self._stats = None              # counter name -> value, 'methods' -> {method name -> [calls, seconds]}
+        self._stats_callback = stats_callback
+        self._stats_interval = stats_interval
+        self._stats_time = time.monotonic()
+        if stats:
+            self._stats = dict.fromkeys(_STATS_COUNTERS, 0)
+            self._stats['methods'] = {}
+            for name in _STATS_METHODS:     # instance attributes hide methods, nothing is timed without stats
+                setattr(self, name, self._get_timed_method(name))
+        self._splits = set()
+        self._splits_mark = None        # (inode, mtime, size) of split file when it is read
+        self._update_splits()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def flush(self):
+        """Write buffered new words to shards"""
+        with self._lock:
+            timer, self._flush_timer = self._flush_timer, None
+        if timer is not None:
+            timer.cancel()              # words added during flush start new timer
+        for filepath in list(self._pending):
+            with self._lock_shard(filepath):
+                pending = self._pending.get(filepath)
+                if pending is None:
+                    continue
+                data = ''.join(pending.lines)
+                with open(filepath, 'a+', encoding='utf-8') as wfile:
+                    wfile.write(data)
+                if self._stats is not None:
+                    self._add_stats(files_opened=1, bytes_written=len(data.encode('utf-8')))
+                del self._pending[filepath]
+                with self._lock:
+                    self._pending_count -= len(pending.lines)
+        if not self._read_only:
+            for filepath, bloom in list(self._blooms.items()):
+                if bloom.dirty:
+                    with self._lock_shard(filepath):
+                        bloom.save(filepath[:-4] + '.bloom')
+        self._flush_time = time.monotonic()
+
+    def close(self):
+        """Write buffered new words, close memory mapped shards and export stats"""
+        self.flush()
+        if self._stats is not None:
+            self.export_stats()
+        for filepath, shard in list(self._shards.items()):
+            if isinstance(shard, _BinShard):
+                with self._get_shard_lock(filepath):
+                    del self._shards[filepath]
+                    shard.close()
+
     def get_word_index(self, string, lang=''):
         assert isinstance(string, str), "Parameter \'string\' is not a string"
         assert isinstance(lang, str), "Parameter \'lang\' is not a string"
         assert (len(string) > 0), "Parameter \'string\' is empty"
 
-        recomp = re.compile(r'\s')          # pattern for all blank symbols
-        if recomp.search(string):           # check if string contain blank symbols
+        if _BLANK_RECOMP.search(string):    # check if string contain blank symbols
             return _WORD_EMPTY
 
         index = self._get_first_index(string)
         if index >= _WORD_IN_FILE_START:
-            filepath = self._get_file_path(string)
-            if filepath != '':
-                index = self._get_index_from_file(filepath, string, lang)
-                if index == _WORD_EMPTY:
-                    index = self._get_new_index_set_to_file(filepath, string, lang)
-            else:
-                index = _WORD_EMPTY
+            index = self._get_cached_index(string, lang)
+            if index == _WORD_EMPTY:
+                filepath = self._get_file_path(string)
+                if filepath != '':
+                    offset = self._marks.get(filepath, (0, 0))[1]  # shard lines to check again at insert
+                    index = self._get_index_from_file(filepath, string, lang)
+                    if (index == _WORD_EMPTY) and not self._read_only:
+                        index = self._get_new_index_set_to_file(filepath, string, lang, offset)
+                        self._check_flush()
+                    self._set_cached_index(string, lang, index)
         return index
 
     def check_word(self, string, lang=''):
@@ -74,151 +405,871 @@ class WordsDict:
         assert isinstance(lang, str), "Parameter \'lang\' is not a string"
         assert (len(string) > 0), "Parameter \'string\' is empty"
 
-        recomp = re.compile(r'\s')          # pattern for all blank symbols
-        if recomp.match(string):            # check if string contain blank symbols
+        if _BLANK_RECOMP.match(string):     # check if string contain blank symbols
             return _WORD_EMPTY
 
         index = self._get_first_index(string)
         if index >= _WORD_IN_FILE_START:
-            filepath = self._get_file_path(string)
-            if filepath != '':
-                index = self._get_index_from_file(filepath, string, lang)
-            else:
-                index = _WORD_EMPTY
+            index = self._get_cached_index(string, lang)
+            if index == _WORD_EMPTY:
+                filepath = self._get_file_path(string)
+                if filepath != '':
+                    index = self._get_index_from_file(filepath, string, lang)
+                    self._set_cached_index(string, lang, index)
         return index
 
+    def get_word_indices(self, strings, lang=''):
+        """Get indices of all words (iterable or newline separated string like format_words result),
+        every shard file is read once and all new words of the shard are appended by one write"""
+        if isinstance(strings, str):
+            strings = strings.split('\n')
+            if strings[-1] == '':
+                strings.pop()
+        assert isinstance(lang, str), "Parameter \'lang\' is not a string"
+
+        indices = []
+        groups = {}                         # shard file path -> [(position, word)]
+        for string in strings:
+            assert isinstance(string, str), "Word is not a string"
+            assert (len(string) > 0), "Word is empty"
+            index = _WORD_EMPTY
+            if not _BLANK_RECOMP.search(string):
+                index = self._get_first_index(string)
+                if index >= _WORD_IN_FILE_START:
+                    index = self._get_cached_index(string, lang)
+                    if index == _WORD_EMPTY:
+                        filepath = self._get_file_path(string)
+                        if filepath != '':
+                            groups.setdefault(filepath, []).append((len(indices), string))
+            indices.append(index)
+
+        for filepath, items in groups.items():
+            self._set_indices_from_file(filepath, items, lang, indices)
+        self._check_flush()
+        return indices
+
+    def encode_text(self, text, lang='', typecode=None, as_numpy=False):
+        """Encode text (string, file object or iterable of text chunks) to packed indices of its words
+        in order of the text between text start and text end indices.
+        typecode - 'I' for 4 bytes indices, 'Q' for words starting with symbols above 0xFF,
+        None - 'I' if indices of all words of text fit 4 bytes
+        Returns array.array or numpy array sharing its buffer if as_numpy."""
+        assert typecode in (None, 'I', 'Q'), "Parameter \'typecode\' is not None, 'I' or 'Q'"
+        words = list(self.format_words_stream(text))
+        fitting = self._get_indices_typecode(words)   # checked before new words are added
+        assert (typecode != 'I') or (fitting == 'I'), "Words starting with symbols above 0xFF need typecode 'Q'"
+        encoded = array.array(typecode or fitting, [_WORD_TEXT_START])
+        encoded.extend(self.get_word_indices(words, lang))
+        encoded.append(_WORD_TEXT_END)
+        if as_numpy:
+            assert numpy is not None, "NumPy is not installed"
+            return numpy.frombuffer(encoded, dtype=(numpy.uint32 if encoded.typecode == 'I' else numpy.uint64))
+        return encoded
+
+    def warm_up(self, symbols):
+        """Prepare shards of words starting with symbols (string or iterable of symbols)
+        before the first requests: directories are created, next indices are found
+        and shards are loaded to index if it is used. Returns number of existing shards."""
+        count = 0
+        for fch in symbols:
+            assert isinstance(fch, str) and (len(fch) == 1), "Symbol is not a single symbol string"
+            if fch <= ' ':
+                continue
+            filepath = self._get_char_file_path(fch)
+            if not os.path.exists(filepath):
+                continue
+            index = ord(fch) * _WORDS_PER_TYPE_MAX
+            with self._lock_shard(filepath):
+                self._get_next_index(filepath, index, index + _WORDS_PER_TYPE_MAX)
+                if self._use_index:
+                    self._update_shard_index(self._get_shard_index(filepath), filepath)
+            count += 1
+        return count
+
+    def preload(self):
+        """Load every shard of data directory to index (or map binary shards of 'bin' backend) once,
+        so lookups of read only dictionary do not read shard files. Processes forked after it
+        share loaded shards copy-on-write. Returns number of loaded shard files."""
+        assert self._use_index, "Shards are loaded with use_index or 'bin' backend only"
+        count = 0
+        for dirpath, dirnames, filenames in os.walk(self._data_dir):
+            for filename in sorted(filenames):
+                if filename.startswith('wd_0x') and filename.endswith('.csv'):
+                    filepath = dirpath + '/' + filename
+                    with self._get_shard_lock(filepath):
+                        self._get_shard_index(filepath)
+                    count += 1
+        return count
+
+    def get_word_by_index(self, index):
+        """Get word of index, '' for empty word and text start and end, None for unknown index"""
+        assert isinstance(index, numbers.Integral), "Parameter \'index\' is not an integer"
+        index = int(index)              # NumPy integers of encoded text
+        if _INTEGER_MIN <= index <= _INTEGER_MAX:
+            return str(index)
+        if index in (_WORD_EMPTY, _WORD_TEXT_START, _WORD_TEXT_END):
+            return ''
+        if index < _WORD_IN_FILE_START:
+            if _WORD_SYMB_START <= index <= _WORD_SYMB_START + 0x10FFFF:
+                return chr(index - _WORD_SYMB_START)
+            return None
+        code = index // _WORDS_PER_TYPE_MAX
+        if code > 0x10FFFF:
+            return None
+        filepath = self._get_char_file_path(chr(code))
+        position = index - code * _WORDS_PER_TYPE_MAX
+        with self._get_shard_lock(filepath):
+            words = self._shards_words.get(filepath)
+            if words is None:
+                words = self._shards_words[filepath] = _ShardWords()
+                for subpath in self._get_sub_file_paths(filepath):
+                    self._update_shard_words(words, subpath, code * _WORDS_PER_TYPE_MAX, 0)
+            if position not in words:
+                words.offset = self._update_shard_words(words, filepath, code * _WORDS_PER_TYPE_MAX, words.offset)
+            if position in words:
+                return words[position]
+            for line in self._pending.get(filepath, _PendingLines()).lines:
+                item = self._parse_shard_line(line)
+                if item[2] == index:
+                    return item[0]
+        return None
+
+    def decode(self, indices):
+        """Get list of words of indices, text start and end indices are skipped"""
+        return [self.get_word_by_index(index) for index in indices
+                if (index != _WORD_TEXT_START) and (index != _WORD_TEXT_END)]
+
+    def get_bloom_stats(self):
+        """Get (number of loaded Bloom filters, bytes of their bits, words added to them)"""
+        blooms = list(self._blooms.values())
+        return (len(blooms), sum(len(bloom.bits) for bloom in blooms), sum(bloom.count for bloom in blooms))
+
+    def get_cache_stats(self):
+        """Get (hits, misses, number of words) of words indices cache"""
+        with self._lock:
+            return (self._cache_hits, self._cache_misses, len(self._cache))
+
+    def get_stats(self):
+        """Get dict of stats counters, None if stats are disabled:
+        files_opened - shard files opened to read or write, lines_scanned - shard lines read,
+        bytes_read, bytes_written - bytes of shard files, words_allocated - new words indices,
+        cache_hits, cache_misses, cache_words - the same as get_cache_stats returns,
+        methods - dict of public method name -> (calls, seconds of all calls)"""
+        with self._lock:
+            if self._stats is None:
+                return None
+            stats = dict(self._stats)
+            stats['methods'] = dict((name, tuple(times)) for name, times in self._stats['methods'].items())
+            stats['cache_hits'] = self._cache_hits
+            stats['cache_misses'] = self._cache_misses
+            stats['cache_words'] = len(self._cache)
+        return stats
+
+    def reset_stats(self):
+        """Set all stats counters and cache hits and misses to zero"""
+        with self._lock:
+            self._cache_hits = 0
+            self._cache_misses = 0
+            if self._stats is not None:
+                self._stats.update(dict.fromkeys(_STATS_COUNTERS, 0))
+                self._stats['methods'] = {}
+
+    def export_stats(self):
+        """Call stats callback with the current stats"""
+        self._stats_time = time.monotonic()
+        if (self._stats_callback is not None) and (self._stats is not None):
+            self._stats_callback(self.get_stats())
+
     def format_words(self, string):
         """Format every word and separate them by newline"""
 
         assert isinstance(string, str), "Parameter \'string\' is not a string"
 
-        recomp = re.compile(r'\s')  # pattern for all space symbols
-        string = recomp.sub('\n', string)  # replace by new line
-        recomp = re.compile(r'(^\d+$)', flags=re.MULTILINE)  # pattern for only digits words
-        string = recomp.sub('', string)
-        recomp = re.compile(r'(^_+)|(_+$)',
-                            flags=re.MULTILINE)  # pattern for underscore symbols in begin and end of the word
-        string = recomp.sub('', string)
-        #recomp = re.compile(r'(^\W+)|(\W+$)',
-        #                    flags=re.MULTILINE)  # pattern for nonword symbols in begin and end of the word
-        #string = recomp.sub('\n', string)
-        string = string.replace('.', '')
-        string = string.replace('\n\n', '\n')
-
-        pattern = r"(^\d\w+$)|(^\d\w*\'\w+$)|(^\d\w*-\w+$)|(^\d\w*-\w+$)|(^\d\w*%$)"
-        recomp = re.compile(pattern, flags=re.MULTILINE)
-        dstrlist = recomp.findall(string)
-        string = recomp.sub('', string)
-        pattern = r"(^#\d\w+$)|(^#\d\w*\'\w+$)|(^#\d\w*-\w+$)|(^#\d\w*-\w+$)"
-        recomp = re.compile(pattern, flags=re.MULTILINE)
-        nstrlist = recomp.findall(string)
-        string = recomp.sub('', string)
-        pattern = r"(^\w+$)|(^\w+-\w+$)|(^\w+\'\w+$)|(^\w+\'\w+\'\w+$)|(^\w+-\w+-\w+$)|(^\w+&\w+$)"
-        recomp = re.compile(pattern, flags=re.MULTILINE)
-        wstrlist = recomp.findall(string)
-
-        resstr = ''
-        if len(wstrlist) != 0:
-            resstr = resstr + '\n'.join(str(''.join(st)) for st in wstrlist) + '\n'
-        if len(dstrlist) != 0:
-            resstr = resstr + '\n'.join(str(''.join(st)) for st in dstrlist) + '\n'
-        if len(nstrlist) != 0:
-            resstr = resstr + '\n'.join(str(''.join(st)) for st in nstrlist) + '\n'
-
-        return resstr
-
-    def _get_new_index_set_to_file(self, filepath, string, lang):
+        words = ([], [], [])                # text, digit and number words lists by word type
+        for word in string.split():         # the same blank symbols as r'\s'
+            item = self._format_word(word)
+            if item is not None:
+                words[item[0]].append(item[1])
+        return ''.join(word + '\n' for wlist in words for word in wlist)
+
+    def format_words_stream(self, source, chunk_size=0x10000, with_type=False):
+        """Generate formatted words of text string, file object or iterable of text chunks.
+        Words are the same as format_words returns but in order of the text,
+        (word type, word) tuples are generated if with_type"""
+        if isinstance(source, str):
+            chunks = (source,)
+        elif hasattr(source, 'read'):
+            chunks = iter(lambda: source.read(chunk_size), '')
+        else:
+            chunks = source
+
+        tail = ''                           # word that can be continued in the next chunk
+        for chunk in chunks:
+            assert isinstance(chunk, str), "Text chunk is not a string"
+            text = tail + chunk
+            tail = ''
+            words = text.split()            # the same blank symbols as r'\s'
+            if (len(words) != 0) and not text[-1].isspace():
+                tail = words.pop()
+            for word in words:
+                item = self._format_word(word)
+                if item is not None:
+                    yield item if with_type else item[1]
+        if tail != '':
+            item = self._format_word(tail)
+            if item is not None:
+                yield item if with_type else item[1]
+
+    def _format_word(self, word):
+        """Format one word without blank symbols -> (word type, word), None if it is not a word"""
+        if word.isdecimal():                # only digits words
+            return None
+        word = word.strip('_').replace('.', '')
+        match = _WORD_RECOMP.fullmatch(word)
+        if match is None:
+            return None
+        return (_WORD_TYPES[match.lastgroup], word)
+
+    def convert_shards_to_bin(self):
+        """Convert every csv shard of data directory to binary shard of 'bin' backend,
+        return number of converted shards"""
+        assert not self._read_only, "Dictionary is read only"
+        count = 0
+        for dirpath, dirnames, filenames in os.walk(self._data_dir):
+            for filename in filenames:
+                if filename.startswith('wd_0x') and filename.endswith('.csv'):
+                    self._convert_shard_to_bin(dirpath + '/' + filename)
+                    count += 1
+        return count
+
+    def _convert_shard_to_bin(self, filepath):
+        index = int(os.path.basename(filepath)[3:-4].split('_')[0], 16) * _WORDS_PER_TYPE_MAX
+        maxindex = index + _WORDS_PER_TYPE_MAX
+        shard = {}
+        offset = 0
+        for line, offset in self._read_shard_lines(filepath, 0):
+            item = self._parse_shard_line(line)
+            if item is not None:
+                self._set_shard_line(shard, line)
+                if index < item[2] < maxindex:
+                    index = item[2]
+
+        keys = sorted((word.encode('utf-8') + b'\t' + lang.encode('utf-8'), idx)
+                      for (word, lang), idx in shard.items())
+        keyoffset = _BIN_HEADER.size + len(keys) * _BIN_RECORD.size
+        data = [_BIN_HEADER.pack(_BIN_MAGIC, len(keys), offset, index)]
+        for key, idx in keys:
+            data.append(_BIN_RECORD.pack(keyoffset, idx))
+            keyoffset += _BIN_KEY_LEN.size + len(key)
+        for key, idx in keys:
+            data.append(_BIN_KEY_LEN.pack(len(key)))
+            data.append(key)
+
+        binpath = filepath[:-4] + '.bin'
+        data = b''.join(data)
+        with open(binpath + '.tmp', 'wb') as wfile:
+            wfile.write(data)
+        if self._stats is not None:
+            self._add_stats(files_opened=1, bytes_written=len(data))
+        os.replace(binpath + '.tmp', binpath)    # readers see the old or the new file only
+        with self._get_shard_lock(filepath):
+            oldshard = self._shards.pop(filepath, None)
+            if isinstance(oldshard, _BinShard):
+                oldshard.close()
+
+    def compact_shards(self, split_size=None):
+        """Compact every shard of data directory: remove repeated lines of (word, lang) and broken lines,
+        sort lines by word and replace shard files atomically. Shards of more than split_size lines
+        are split to files by the second symbol of word, new words are still appended to shard.
+        Indices of words are not changed. Other WordsDict objects must not use data directory
+        while it is compacted. Returns number of removed lines."""
+        assert not self._read_only, "Dictionary is read only"
+        self.flush()
+        removed = 0
+        for dirpath, dirnames, filenames in os.walk(self._data_dir):
+            for filename in sorted(filenames):
+                if filename.startswith('wd_0x') and filename.endswith('.csv') and ('_' not in filename[3:]):
+                    removed += self._compact_shard(dirpath + '/' + filename, split_size)
+        return removed
+
+    def _compact_shard(self, filepath, split_size):
+        fch = chr(int(os.path.basename(filepath)[3:-4], 16))
+        firstindex = ord(fch) * _WORDS_PER_TYPE_MAX
+        with self._lock_shard(filepath):
+            subpaths = self._get_sub_file_paths(filepath)
+            count = 0
+            items = []                      # words of split files go before new words of shard
+            for path in subpaths + [filepath]:
+                for line, offset in self._read_shard_lines(path, 0):
+                    count += 1
+                    item = self._parse_shard_line(line)
+                    if item is not None:
+                        items.append(item)
+
+            lastitem = None                 # line of the last index is kept to continue indices
+            for item in items:
+                if (firstindex <= item[2] < firstindex + _WORDS_PER_TYPE_MAX) and \
+                        ((lastitem is None) or (item[2] > lastitem[2])):
+                    lastitem = item
+            keys = set()
+            lines = []
+            for item in items:
+                if ((item[0], item[1]) not in keys) or (item is lastitem):
+                    keys.add((item[0], item[1]))
+                    lines.append(item)
+            lines.sort(key=lambda item: item[0])    # stable, the first line of word is still the first
+
+            paths = [filepath]
+            if (fch in self._splits) or ((split_size is not None) and (len(lines) > split_size)):
+                groups = {}
+                for item in lines:
+                    if item is not lastitem:        # it is kept in shard only
+                        groups.setdefault(self._get_sub_file_path(filepath, item[0]), []).append(item)
+                for path, group in groups.items():
+                    self._write_shard_file(path, group)
+                for path in subpaths:
+                    if path not in groups:
+                        os.remove(path)
+                        self._remove_file(path[:-4] + '.bin')
+                        self._remove_file(path[:-4] + '.bloom')
+                if fch not in self._splits:
+                    self._splits.add(fch)
+                    self._write_splits()
+                self._write_shard_file(filepath, [lastitem] if lastitem is not None else [])
+                paths += sorted(groups)
+            else:
+                self._write_shard_file(filepath, lines)
+
+            for path in paths + subpaths:
+                self._shards.pop(path, None)
+                self._shards_words.pop(path, None)
+                self._marks.pop(path, None)
+                self._blooms.pop(path, None)
+                self._remove_file(path[:-4] + '.bloom')     # filter is made again from compacted shard
+            for path in paths:
+                if os.path.exists(path[:-4] + '.bin'):
+                    self._convert_shard_to_bin(path)
+        return count - len(lines)
+
+    def _write_shard_file(self, filepath, items):
+        data = ''.join(word + '\t' + lang + '\t' + str(index) + '\n' for word, lang, index in items)
+        with open(filepath + '.tmp', 'w', encoding='utf-8') as wfile:
+            wfile.write(data)
+        if self._stats is not None:
+            self._add_stats(files_opened=1, bytes_written=len(data.encode('utf-8')))
+        os.replace(filepath + '.tmp', filepath)
+
+    def _write_splits(self):
+        filepath = self._data_dir + '/' + _WORDS_DICT_SPLIT_FILE
+        with open(filepath + '.tmp', 'w', encoding='utf-8') as wfile:
+            wfile.write(''.join(hex(ord(fch)) + '\n' for fch in sorted(self._splits)))
+        os.replace(filepath + '.tmp', filepath)
+
+    def _remove_file(self, filepath):
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+
+    def _read_shard_lines(self, filepath, offset):
+        """Generate (line, offset after line) of completely written shard lines starting from offset"""
+        with open(filepath, 'rb') as rfile:
+            offset = self._get_shard_read_offset(filepath, rfile, offset)
+            rfile.seek(offset)
+            start = offset
+            count = 0
+            try:
+                for bline in rfile:
+                    if bline[-1:] != b'\n':
+                        break           # line is not completely written yet
+                    offset += len(bline)
+                    count += 1
+                    yield (bline.decode('utf-8', 'replace'), offset)
+            finally:
+                if self._stats is not None:
+                    self._add_stats(files_opened=1, lines_scanned=count, bytes_read=offset - start)
+
+    def _get_shard_read_offset(self, filepath, rfile, offset):
+        """Get offset to read opened shard file from, 0 if the file is replaced after the previous read
+        (by compact_shards of other object), then bytes already read of all shard data are forgotten"""
+        stat = os.fstat(rfile.fileno())
+        inode = self._inodes.get(filepath)
+        self._inodes[filepath] = stat.st_ino
+        if ((inode is None) or (inode == stat.st_ino)) and (offset <= stat.st_size):
+            return offset
+        mark = self._marks.get(filepath)
+        if mark is not None:
+            self._marks[filepath] = (mark[0], 0)    # indices are not changed by compaction
+        shard = self._shards.get(filepath)
+        if shard is not None:
+            shard.offset = 0            # lines already read are skipped by setdefault
+            if isinstance(shard, _BinShard) and (shard.mark is not None):
+                shard.mark = (shard.mark[0], 0)
+        words = self._shards_words.get(filepath)
+        if words is not None:
+            words.offset = 0
+        bloom = self._blooms.get(filepath)
+        if bloom is not None:
+            bloom.offset = 0
+        return 0
+
+    def _get_new_index_set_to_file(self, filepath, string, lang, offset=0):
+        """offset - shard size already read by the word lookup when the shard is not indexed"""
         index = self._get_first_index(string)
         maxindex = index + _WORDS_PER_TYPE_MAX
+        with self._lock_shard(filepath, self._buffer_size == 0):
+            if self._use_index:
+                shard = self._get_shard_index(filepath)
+                if self._buffer_size == 0:
+                    self._update_shard_index(shard, filepath)
+                oldindex = shard.get((string, lang))
+            else:
+                shard = _ShardIndex()   # lines appended after the word lookup
+                shard.offset = offset
+                self._update_shard_index(shard, filepath)
+                oldindex = shard.get((string, lang))
+                if oldindex is None:
+                    oldindex = self._get_pending_index(filepath, string, lang)
+            if oldindex is not None:
+                return oldindex         # word is added by other writer after the lookup
+            index = self._get_next_index(filepath, index, maxindex)
+            if index < maxindex:
+                self._set_lines_to_file(filepath, [string + '\t' + lang + '\t' + str(index) + '\n'], index)
+            else:
+                index = _WORD_EMPTY     # words number overflow
+        return index
+
+    def _set_indices_from_file(self, filepath, items, lang, indices):
+        self._update_splits()
+        if items[0][1][0] in self._splits:
+            items = self._set_indices_from_sub_files(filepath, items, lang, indices)
+            if len(items) == 0:
+                return
+
+        with self._lock_shard(filepath, self._buffer_size == 0):
+            if self._use_index:
+                shard = self._get_shard_index(filepath)
+                if (self._buffer_size == 0) and not self._read_only:
+                    self._update_shard_index(shard, filepath)
+            else:
+                shard = self._read_shard_words(filepath, set(string for position, string in items))
+                if filepath in self._pending:
+                    for line in self._pending[filepath].lines:
+                        self._set_shard_line(shard, line)
+
+            lines = []
+            newindex = None
+            for position, string in items:
+                index = shard.get((string, lang), _WORD_EMPTY)
+                if (index == _WORD_EMPTY) and not self._read_only:
+                    if newindex is None:
+                        newindex = self._get_first_index(string)
+                        maxindex = newindex + _WORDS_PER_TYPE_MAX
+                        newindex = self._get_next_index(filepath, newindex, maxindex)
+                    if newindex < maxindex:
+                        line = string + '\t' + lang + '\t' + str(newindex) + '\n'
+                        lines.append(line)
+                        self._set_shard_line(shard, line)
+                        index = newindex
+                        newindex += 1
+                indices[position] = index
+                self._set_cached_index(string, lang, index)
+
+            if len(lines) != 0:
+                self._set_lines_to_file(filepath, lines, newindex - 1)
+
+    def _set_indices_from_sub_files(self, filepath, items, lang, indices):
+        """Set indices of words found in files of split shard, return items of other words"""
+        groups = {}                         # file path -> [(position, word)]
+        for position, string in items:
+            groups.setdefault(self._get_sub_file_path(filepath, string), []).append((position, string))
+        otheritems = []
+        for subpath, subitems in groups.items():
+            if self._use_index:
+                with self._get_shard_lock(subpath):
+                    shard = self._get_shard_index(subpath)
+            else:
+                shard = self._read_shard_words(subpath, set(string for position, string in subitems))
+            for position, string in subitems:
+                index = shard.get((string, lang), _WORD_EMPTY)
+                if index == _WORD_EMPTY:
+                    otheritems.append((position, string))
+                else:
+                    indices[position] = index
+                    self._set_cached_index(string, lang, index)
+        otheritems.sort()
+        return otheritems
+
+    def _read_shard_words(self, filepath, words):
+        """Read shard lines of words to dict by (word, lang) key"""
+        shard = {}
         try:
             with open(filepath, 'r', encoding='utf-8') as rfile:
-                while True:
-                    line = rfile.readline()
-                    if line == '':
-                        index += 1
-                        break
-                    try:
-                        start = line.index('\t') + 1
-                        start = line.index('\t', start) + 1
-                        end = line.index('\n')
-                        idx = int(line[start:end])
-                        if (idx > index) and (idx < maxindex):
-                            index = idx
-                    except:
-                        pass
-        except:
+                count = 0
+                for line in rfile:
+                    count += 1
+                    if line[:line.find('\t')] in words:
+                        self._set_shard_line(shard, line)
+                if self._stats is not None:
+                    self._add_stats(files_opened=1, lines_scanned=count, bytes_read=rfile.buffer.tell())
+        except FileNotFoundError:
             pass
-        if index < maxindex:
-            line = string + '\t' + lang + '\t' + str(index) + '\n'
+        return shard
+
+    def _set_lines_to_file(self, filepath, lines, lastindex):
+        """Append new lines to shard file or to buffer of new words, lastindex - index of the last line"""
+        if self._stats is not None:
+            self._add_stats(words_allocated=len(lines))
+        if self._buffer_size == 0:
+            data = ''.join(lines)
             with open(filepath, 'a+', encoding='utf-8') as wfile:
-                wfile.write(line)
+                wfile.write(data)
+            if self._stats is not None:
+                self._add_stats(files_opened=1, bytes_written=len(data.encode('utf-8')))
         else:
-            index = _WORD_EMPTY     # words number overflow
+            pending = self._pending.get(filepath)
+            if pending is None:
+                pending = self._pending[filepath] = _PendingLines()
+            for line in lines:
+                pending.lines.append(line)
+                self._set_shard_line(pending, line)
+            with self._lock:
+                self._pending_count += len(lines)
+                if (self._flush_interval is not None) and (self._flush_timer is None):
+                    self._flush_timer = threading.Timer(self._flush_interval, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+        self._marks[filepath] = (lastindex, self._marks.get(filepath, (0, 0))[1])
+        shard = self._shards.get(filepath)
+        if shard is not None:
+            for line in lines:
+                self._set_shard_line(shard, line)
+
+    def _get_pending_index(self, filepath, string, lang):
+        pending = self._pending.get(filepath)
+        if pending is None:
+            return None
+        return pending.get((string, lang))
+
+    def _add_stats(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                self._stats[name] += value
+
+    def _get_timed_method(self, name):
+        """Wrap bound public method to add its calls and time to stats"""
+        method = getattr(self, name)
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                with self._lock:
+                    times = self._stats['methods'].setdefault(name, [0, 0.0])
+                    times[0] += 1
+                    times[1] += seconds
+                if (self._stats_interval is not None) and \
+                        (time.monotonic() - self._stats_time >= self._stats_interval):
+                    self.export_stats()
+        return timed
+
+    def _check_flush(self):
+        if self._buffer_size == 0:
+            return
+        if (self._pending_count >= self._buffer_size) or \
+                ((self._flush_interval is not None) and (time.monotonic() - self._flush_time >= self._flush_interval)):
+            self.flush()
+
+    @contextlib.contextmanager
+    def _lock_shard(self, filepath, for_processes=True):
+        """Lock shard for other threads (and processes) while new words are allocated and appended"""
+        with self._get_shard_lock(filepath):
+            if (fcntl is None) or not for_processes or self._read_only:
+                yield
+                return
+            with open(filepath[:-4] + '.lock', 'a') as lfile:
+                fcntl.flock(lfile.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lfile.fileno(), fcntl.LOCK_UN)
+
+    def _get_shard_lock(self, filepath):
+        lock = self._shard_locks.get(filepath)
+        if lock is None:
+            with self._lock:
+                lock = self._shard_locks.setdefault(filepath, threading.RLock())
+        return lock
+
+    def _get_cached_index(self, string, lang):
+        if self._cache_size == 0:
+            return _WORD_EMPTY
+        key = (string, lang)
+        with self._lock:
+            index = self._cache.get(key)
+            if index is None:
+                self._cache_misses += 1
+                return _WORD_EMPTY
+            self._cache_hits += 1
+            self._cache.move_to_end(key)
         return index
 
+    def _set_cached_index(self, string, lang, index):
+        if (self._cache_size == 0) or (index == _WORD_EMPTY):
+            return
+        with self._lock:
+            self._cache[(string, lang)] = index
+            self._cache.move_to_end((string, lang))
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _get_next_index(self, filepath, index, maxindex):
+        """Get next free index of shard, only lines appended after the previous call are read"""
+        mark = self._marks.get(filepath)
+        if (mark is not None) and (self._buffer_size != 0):
+            return mark[0] + 1          # the only writer knows the last index of shard
+        if (mark is None) and (self._backend == 'bin'):
+            mark = self._get_shard_index(filepath).mark
+        lastindex, offset = mark or (index, 0)
+        try:
+            for line, offset in self._read_shard_lines(filepath, offset):
+                item = self._parse_shard_line(line)
+                if (item is not None) and (lastindex < item[2] < maxindex):
+                    lastindex = item[2]
+        except FileNotFoundError:
+            self._marks.pop(filepath, None)
+            return index            # the first word of shard takes the first index of type
+        self._marks[filepath] = (lastindex, offset)
+        return lastindex + 1
+
+    def _get_shard_index(self, filepath):
+        shard = self._shards.get(filepath)
+        if shard is None:
+            if self._backend == 'bin':
+                shard = _BinShard(filepath)
+            else:
+                shard = _ShardIndex()
+            self._update_shard_index(shard, filepath)
+            if filepath in self._pending:
+                for line in self._pending[filepath].lines:
+                    self._set_shard_line(shard, line)
+            self._shards[filepath] = shard
+        return shard
+
+    def _update_shard_index(self, shard, filepath):
+        """Read shard lines appended after the previous update"""
+        try:
+            for line, offset in self._read_shard_lines(filepath, shard.offset):
+                self._set_shard_line(shard, line)
+                shard.offset = offset
+        except FileNotFoundError:
+            pass
+
+    def _update_shard_words(self, words, filepath, firstindex, offset):
+        """Read shard lines starting from offset to words dict, return offset of the end of lines"""
+        try:
+            for line, offset in self._read_shard_lines(filepath, offset):
+                item = self._parse_shard_line(line)
+                if (item is None) or not (0 <= item[2] - firstindex < _WORDS_PER_TYPE_MAX):
+                    continue
+                words.setdefault(item[2] - firstindex, item[0])      # the first line of index wins
+        except FileNotFoundError:
+            pass
+        return offset
+
+    def _set_shard_line(self, shard, line):
+        """Put one shard line to index, the first line of the word wins as in the file scan"""
+        item = self._parse_shard_line(line)
+        if item is not None:
+            shard.setdefault((item[0], item[1]), item[2])
+            shard.setdefault((item[0], ''), item[2])    # empty lang matches word of any lang
+
+    def _parse_shard_line(self, line):
+        """Shard line -> (word, lang, index), None for broken line"""
+        if line[-1:] != '\n':
+            return None
+        items = line[:-1].split('\t')
+        if len(items) != 3:
+            return None
+        try:
+            return (items[0], items[1], int(items[2]))
+        except ValueError:
+            return None
+
     def _get_index_from_file(self, filepath, string, lang):
+        self._update_splits()
+        if string[0] in self._splits:       # compacted words are in file by the second symbol
+            index = self._get_index_from_shard(self._get_sub_file_path(filepath, string), string, lang)
+            if index != _WORD_EMPTY:
+                return index
+        return self._get_index_from_shard(filepath, string, lang)
+
+    def _get_index_from_shard(self, filepath, string, lang):
+        if self._use_index:
+            with self._get_shard_lock(filepath):
+                shard = self._get_shard_index(filepath)
+                index = shard.get((string, lang), _WORD_EMPTY)
+                if (index == _WORD_EMPTY) and (self._buffer_size == 0) and not self._read_only:
+                    self._update_shard_index(shard, filepath)  # word can be added by other writer
+                    index = shard.get((string, lang), _WORD_EMPTY)
+            return index
+
+        index = _WORD_EMPTY
+        if (self._bloom_fp_rate is None) or self._check_bloom(filepath, string):
+            index = self._scan_shard(filepath, string, lang)
+        if (index == _WORD_EMPTY) and (filepath in self._pending):
+            index = self._get_pending_index(filepath, string, lang) or _WORD_EMPTY
+        return index
+
+    def _scan_shard(self, filepath, string, lang):
+        """Find index of word in shard file reading it line by line"""
         index = _WORD_EMPTY
         try:
             with open(filepath, 'r', encoding='utf-8') as rfile:
                 lenstring = len(string)
-                lenlang = len(lang)
+                count = 0
                 while True:
                     line = rfile.readline()
+                    count += 1
                     if (len(line) > lenstring) and (line[lenstring] == '\t'):
                         if string == line[0:lenstring]:
-                            end = lenstring
-                            try:
-                                if lang != '':
-                                    start = line.index(lang, end) + lenlang
-                                else:
-                                    start = line.index('\t', end) + 1
-                                start = line.index('\t', start) + 1
-                                end = line.index('\n')
-                                index = int(line[start:end])
+                            item = self._parse_shard_line(line)     # lang is matched exactly as in index
+                            if (item is not None) and ((lang == '') or (item[1] == lang)):
+                                index = item[2]
                                 break
-                            except:
-                                pass
                     else:
                         if line == '':
+                            count -= 1      # end of file
                             break
+                if self._stats is not None:
+                    self._add_stats(files_opened=1, lines_scanned=count, bytes_read=rfile.buffer.tell())
         except:
             pass
         return index
 
+    def _check_bloom(self, filepath, string):
+        """Check word with Bloom filter of shard, False if word is not in shard file for sure"""
+        with self._get_shard_lock(filepath):
+            bloom = self._blooms.get(filepath)
+            if bloom is None:
+                bloom = self._blooms[filepath] = self._load_bloom(filepath)
+            elif not self._read_only:
+                bloom = self._update_bloom(bloom, filepath)     # words can be appended by other writer
+            return string in bloom
+
+    def _load_bloom(self, filepath):
+        """Read Bloom filter of shard from file or make it from shard file if it is absent or not suitable"""
+        bloom = _ShardBloom.load(filepath[:-4] + '.bloom')
+        if (bloom is None) or (bloom.nbits != _ShardBloom.get_bits_number(bloom.capacity, self._bloom_fp_rate)):
+            try:
+                size = os.path.getsize(filepath)
+            except FileNotFoundError:
+                size = 0
+            bloom = _ShardBloom(max(_BLOOM_CAPACITY_MIN, size // 8), self._bloom_fp_rate)   # lines are longer
+        return self._update_bloom(bloom, filepath)
+
+    def _update_bloom(self, bloom, filepath):
+        """Add words of lines appended to shard file after the previous update, return filter
+        made again if shard file is replaced by smaller one or filter is full"""
+        try:
+            stat = os.stat(filepath)
+            size, inode = stat.st_size, stat.st_ino
+        except FileNotFoundError:
+            size, inode = 0, None
+        if (size == bloom.offset) and (inode == self._inodes.get(filepath, inode)):
+            return bloom
+        if size < bloom.offset:         # shard is compacted
+            bloom = _ShardBloom(bloom.capacity, self._bloom_fp_rate)
+        try:
+            for line, offset in self._read_shard_lines(filepath, bloom.offset):
+                bloom.add(line[:line.find('\t')])
+                bloom.offset = offset
+        except FileNotFoundError:
+            pass
+        if bloom.count > bloom.capacity:
+            bloom = self._update_bloom(_ShardBloom(bloom.count * 2, self._bloom_fp_rate), filepath)
+        return bloom
+
     def _get_file_path(self, string):
         fp = ''
         fch = string[0]
         if (len(string) > 1) and (fch > ' '):
-            indx = ord(fch)
-            fch = hex(indx)
+            fp = self._get_char_file_path(fch)
+        return fp
 
-            if indx <= 0xFF:
-                fdir = '0xff/'
-            else:
-                i = 0x0FFF
-                fdir = 'XX/'
-                while i <= 0xFFFFFF:
-                    if indx <= i:
-                        fdir = hex(i) + '/'
-                        break
-                    i += 0x1000
-
-            fp = _WORDS_DICT_DATA_DIR + '/wd_'
-            fp += fdir
+    def _get_sub_file_path(self, filepath, string):
+        """Get path of file of split shard for words with the second symbol of string"""
+        return filepath[:-4] + '_' + hex(ord(string[1])) + '.csv'
+
+    def _get_sub_file_paths(self, filepath):
+        """Get paths of all files of split shard"""
+        fdir, fname = os.path.split(filepath)
+        prefix = fname[:-4] + '_'
+        try:
+            return [fdir + '/' + name for name in sorted(os.listdir(fdir))
+                    if name.startswith(prefix) and name.endswith('.csv')]
+        except FileNotFoundError:
+            return []
+
+    def _update_splits(self):
+        """Read symbols of split shards again if split file is changed (by compact_shards of other object)"""
+        try:
+            stat = os.stat(self._data_dir + '/' + _WORDS_DICT_SPLIT_FILE)
+            mark = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            mark = None
+        if mark != self._splits_mark:
+            self._splits = self._read_splits()
+            self._splits_mark = mark
+
+    def _read_splits(self):
+        """Read symbols of shards split to files by the second symbol of word"""
+        try:
+            with open(self._data_dir + '/' + _WORDS_DICT_SPLIT_FILE, 'r', encoding='utf-8') as rfile:
+                return set(chr(int(line, 16)) for line in rfile if line.strip() != '')
+        except FileNotFoundError:
+            return set()
+
+    def _get_char_file_path(self, fch):
+        """Get path of shard for words starting with fch symbol, directory is created once"""
+        fp = self._paths.get(fch)
+        if fp is not None:
+            return fp
+
+        indx = ord(fch)
+        if indx <= 0xFF:
+            fdir = '0xff/'
+        else:
+            fdir = hex(indx | 0x0FFF) + '/'     # directory per 0x1000 symbols
+
+        fp = self._data_dir + '/wd_'
+        fp += fdir
+        if not self._read_only:
             try:
                 os.mkdir(fp)
             except FileExistsError:
                 pass
 
-            fp += 'wd_' + fch + '.csv'
+        fp += 'wd_' + hex(indx) + '.csv'
+        self._paths[fch] = fp
         return fp
 
+    def _get_indices_typecode(self, strings):
+        """Get array typecode fitting indices of all words: 'I' or 'Q' if any word starts with symbol above 0xFF"""
+        for string in strings:
+            if (string[0] > '\xff') and (self._get_first_index(string) > _WORD_IN_FILE_UINT32_MAX):
+                return 'Q'
+        return 'I'
+
     def _get_first_index(self, string):
         index = _WORD_EMPTY
         fch = string[0]
 
         if fch > ' ':
-            if string.isalnum():
+            if string.isdecimal():
                 val = int(string)
                 if val <= _INTEGER_MAX:
                     index = val
@@ -232,3 +1283,160 @@ class WordsDict:
                     index = index + _WORD_SYMB_START
 
         return index
+
+
+_INGEST_KNOWN_WORDS_MAX = 0x100000  # words indices kept by ingest to skip dictionary lookups
+_INGEST_CHUNKS_PER_JOB = 2          # chunks formatted or waiting for indices per worker process
+_ingest_wdict = None                # WordsDict of ingest worker process for words formatting
+
+
+def _init_ingest_worker():
+    global _ingest_wdict
+    _ingest_wdict = WordsDict(read_only=True)
+
+
+def _format_ingest_chunk(task):
+    """(file number, bytes of file read, text) -> (file number, bytes of file read, formatted words),
+    words are separated by newline as format_words does to pass them between processes quickly"""
+    fileno, position, text = task
+    if text is not None:
+        text = '\n'.join(_ingest_wdict.format_words_stream(text))
+    return (fileno, position, text)
+
+
+def _read_ingest_chunks(filepaths, chunk_size):
+    """Generate (file number, bytes of file read, text) of files, chunks end at the end of line
+    so words are not split between chunks, text None ends every file"""
+    for fileno, filepath in enumerate(filepaths):
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as rfile:
+            while True:
+                text = rfile.read(chunk_size)
+                if text == '':
+                    break
+                if not text[-1].isspace():
+                    text += rfile.readline()
+                yield (fileno, rfile.buffer.tell(), text)
+        yield (fileno, os.path.getsize(filepath), None)
+
+
+def _format_ingest_chunks_in_pool(pool, chunks, jobs):
+    """Generate formatted chunks in order of chunks, at most _INGEST_CHUNKS_PER_JOB * jobs chunks
+    are read ahead, so memory is bounded when words get indices slower than they are formatted"""
+    results = deque()
+    for chunk in chunks:
+        if len(results) >= _INGEST_CHUNKS_PER_JOB * jobs:
+            yield results.popleft().get()
+        results.append(pool.apply_async(_format_ingest_chunk, (chunk,)))
+    while results:
+        yield results.popleft().get()
+
+
+def ingest(filepaths, lang='', jobs=None, output_dir=None, typecode=None, chunk_size=0x100000,
+           buffer_size=0x10000, progress=sys.stderr, data_dir=None):
+    """Encode text files to '.wde' files of save_encoded (next to text files or in output_dir).
+    Words are formatted in jobs processes (number of CPUs if None, 1 - in this process)
+    and get indices in this process, the only writer of new words to shards.
+    Progress and throughput are written to progress file once a second if it is not None.
+    typecode - 'I' or 'Q' indices of all files, None - 'I' for files which words indices fit 4 bytes.
+    data_dir - data directory of WordsDict, _WORDS_DICT_DATA_DIR if None.
+    Returns (number of words, number of new words, bytes of files, seconds)."""
+    assert typecode in (None, 'I', 'Q'), "Parameter \'typecode\' is not None, 'I' or 'Q'"
+    jobs = jobs or os.cpu_count() or 1
+    starttime = time.monotonic()
+    reporttime = starttime
+    state = {'files': 0, 'done': 0, 'current': 0, 'words': 0}   # done - bytes of completed files
+
+    def report(now):
+        seconds = max(now - starttime, 1e-9)
+        size = state['done'] + state['current']
+        progress.write('Files %d/%d, %.1f MB, %d words, %.2f MB/s, %.0f words/s\n' %
+                       (state['files'], len(filepaths), size / 0x100000, state['words'],
+                        size / 0x100000 / seconds, state['words'] / seconds))
+
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs, _init_ingest_worker)
+    else:
+        _init_ingest_worker()
+    try:
+        chunks = _read_ingest_chunks(filepaths, chunk_size)
+        if pool is not None:
+            results = _format_ingest_chunks_in_pool(pool, chunks, jobs)     # in order of files and chunks
+        else:
+            results = map(_format_ingest_chunk, chunks)
+        encoded = None
+        known = {}                      # word -> index of words of files already encoded
+        with WordsDict(use_index=True, buffer_size=buffer_size, stats=True, data_dir=data_dir) as wd:
+            for fileno, position, text in results:
+                if encoded is None:
+                    encoded = array.array(typecode or 'I', [_WORD_TEXT_START])
+                state['current'] = position
+                if text is None:        # end of file
+                    encoded.append(_WORD_TEXT_END)
+                    filepath = filepaths[fileno]
+                    if output_dir is not None:
+                        filepath = os.path.join(output_dir, os.path.basename(filepath))
+                    save_encoded(filepath + '.wde', encoded)
+                    encoded = None
+                    state['files'] += 1
+                    state['done'] += position
+                    state['current'] = 0
+                elif text != '':
+                    fwords = text.split('\n')
+                    if (encoded.typecode == 'I') and (wd._get_indices_typecode(fwords) == 'Q'):
+                        assert typecode is None, "Words starting with symbols above 0xFF need typecode 'Q'"
+                        encoded = array.array('Q', encoded)     # before new words are added
+                    newkeys = list(dict.fromkeys(word for word in fwords if word not in known))  # in text order
+                    if len(known) + len(newkeys) > _INGEST_KNOWN_WORDS_MAX:
+                        known.clear()
+                        newkeys = list(dict.fromkeys(fwords))
+                    known.update(zip(newkeys, wd.get_word_indices(newkeys, lang)))
+                    encoded.extend(map(known.__getitem__, fwords))
+                    state['words'] += len(fwords)
+                now = time.monotonic()
+                if (progress is not None) and (now - reporttime >= 1.0):
+                    reporttime = now
+                    report(now)
+            newwords = wd.get_stats()['words_allocated']
+    finally:
+        if pool is not None:
+            pool.terminate()
+    seconds = time.monotonic() - starttime
+    if progress is not None:
+        report(starttime + seconds)
+    return (state['words'], newwords, state['done'], seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='wordsdict', description='Dictionary of all words')
+    parser.add_argument('--data-dir', default=_WORDS_DICT_DATA_DIR, help='words dictionary data directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compact = subparsers.add_parser('compact', help='remove repeated lines and sort shards')
+    compact.add_argument('--split-size', type=int, default=None,
+                         help='split shards of more lines to files by the second symbol of word')
+    ingestion = subparsers.add_parser('ingest', help='encode text files to .wde files adding new words')
+    ingestion.add_argument('files', nargs='+', help='UTF-8 text files')
+    ingestion.add_argument('--lang', default='', help='language of words')
+    ingestion.add_argument('--jobs', type=int, default=None,
+                           help='words formatting processes, number of CPUs by default')
+    ingestion.add_argument('--output-dir', default=None,
+                           help='directory of .wde files, directory of text file by default')
+    ingestion.add_argument('--typecode', choices=('I', 'Q'), default=None,
+                           help="'Q' for words starting with symbols above 0xFF, the smallest fitting by default")
+    ingestion.add_argument('--quiet', action='store_true', help='do not report progress')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compact':
+        with WordsDict(data_dir=args.data_dir) as wd:
+            print('Removed lines:', wd.compact_shards(args.split_size))
+    elif args.command == 'ingest':
+        words, newwords, size, seconds = ingest(args.files, args.lang, args.jobs, args.output_dir, args.typecode,
+                                                progress=None if args.quiet else sys.stderr,
+                                                data_dir=args.data_dir)
+        print('Words: %d, new words: %d, %.1f MB in %.2f s, %.2f MB/s, %.0f words/s' %
+              (words, newwords, size / 0x100000, seconds, size / 0x100000 / max(seconds, 1e-9),
+               words / max(seconds, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import pathlib
+import random
+import tempfile
+import wordsdict
+from wordsdict import *
+from asyncwordsdict import *
+
+
+def test_async_word_index(tmp_path):
+    datadir = str(tmp_path / 'async')
+    os.mkdir(datadir)
+    words = ['w' + str(i % 40) for i in range(200)] + ['v' + str(i) for i in range(50)] + ['42', 'x', 'a b']
+    random.Random(3).shuffle(words)
+
+    async def get_indices():
+        awd = AsyncWordsDict(max_workers=2, data_dir=datadir)
+        indices = await asyncio.gather(*(awd.get_word_index(word) for word in words))
+        batch = await awd.get_word_indices(['z1', 'w1', 'z1'])
+        assert await awd.check_word('z1') == batch[0]
+        awd.close()
+        return indices, batch
+
+    indices, batch = asyncio.run(get_indices())
+    wd = WordsDict(data_dir=datadir)
+    assert indices == [wd.check_word(word) for word in words]
+    assert batch == [wd.check_word('z1'), wd.check_word('w1'), wd.check_word('z1')]
+    assert len(set(indices)) == 40 + 50 + 3
+
+    datadir = str(tmp_path / 'sequential')
+    os.mkdir(datadir)
+    wd = WordsDict(data_dir=datadir)
+    assert [wd.get_word_index(word) for word in words] == indices
+
+
+def test_async_buffered(tmp_path):
+    datadir = str(tmp_path)
+    words = ['hello', 'world', 'help', '\u043f\u0440\u0438\u0432\u0456\u0442']
+
+    async def get_indices():
+        async with AsyncWordsDict(buffer_size=100, data_dir=datadir) as awd:
+            return await asyncio.gather(*(awd.get_word_index(word) for word in words))
+
+    indices = asyncio.run(get_indices())
+    assert [WordsDict(data_dir=datadir).check_word(word) for word in words] == indices
+
+    wd = WordsDict(data_dir=datadir, buffer_size=100)
+    awd = AsyncWordsDict(wd)
+    index = asyncio.run(awd.get_word_index('sun'))
+    awd.close()
+    assert WordsDict(data_dir=datadir).check_word('sun') == index != wordsdict._WORD_EMPTY
+
+
+def test_cancelled_batch(tmp_path):
+    async def cancel_batch():
+        awd = AsyncWordsDict(data_dir=str(tmp_path))
+        loop = asyncio.get_running_loop()
+        wfutures = [loop.create_future(), loop.create_future()]
+        future = loop.create_future()
+        future.cancel()                 # I/O of batch is cancelled
+        awd._set_batch_result(('h', ''), [('hello', wfutures[0]), ('help', wfutures[1])], future)
+        awd.close()
+        return wfutures
+
+    assert all(wfuture.cancelled() for wfuture in asyncio.run(cancel_batch()))
+
+
+def run_in_temp_dir(test):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        test(pathlib.Path(tmpdir))
+
+
+def main():
+    run_in_temp_dir(test_async_word_index)
+    run_in_temp_dir(test_async_buffered)
+    run_in_temp_dir(test_cancelled_batch)
+
+
+if __name__ == '__main__':
+    main()
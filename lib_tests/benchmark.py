@@ -0,0 +1,153 @@
+# @file benchmark.py
+# @brief Benchmarks of WordsDict and DateTimeExt hot paths.
+# @author Sielskyi Leonid (sielskyi)
+#
+
+# Usage (from lib_tests directory):
+#   PYTHONPATH=../lib python benchmark.py --words 20000 --output bench.json
+#   PYTHONPATH=../lib python benchmark.py --compare bench.json
+#
+# Synthetic corpora are generated from --seed, so runs with the same
+# arguments measure the same work. Results are written as JSON.
+#
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import wordsdict
+from wordsdict import *
+from datetimeext import *
+
+
+def get_random_words(rnd, number):
+    letters = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    words = set()
+    while len(words) < number:
+        words.add(''.join(rnd.choice(letters) for i in range(rnd.randint(2, 10))))
+    return sorted(words)
+
+
+def get_random_text(rnd, words, size):
+    parts = []
+    length = 0
+    while length < size:
+        part = rnd.choice(words)
+        kind = rnd.random()
+        if kind < 0.05:
+            part = str(rnd.randint(0, 99999))
+        elif kind < 0.08:
+            part = str(rnd.randint(1, 99)) + part
+        elif kind < 0.1:
+            part = '#' + str(rnd.randint(1, 9)) + part
+        part += rnd.choice(' ,. \n')
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)
+
+
+def measure(results, name, operations, function, *args):
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+    results[name] = {'operations': operations, 'seconds': seconds,
+                     'per_second': operations / seconds if seconds > 0 else 0.0}
+    if name.endswith('_bytes'):
+        results[name]['mb_per_second'] = results[name]['per_second'] / (1024 * 1024)
+        print('%-32s %12d B   %10.4f s %14.2f MB/s' % (name, operations, seconds, results[name]['mb_per_second']))
+    else:
+        print('%-32s %12d ops %10.4f s %14.1f ops/s' % (name, operations, seconds, results[name]['per_second']))
+
+
+def bench_words_dict(results, rnd, args):
+    words = get_random_words(rnd, args.words)
+    lookups = [rnd.choice(words) for i in range(args.lookups)]
+    datadir = tempfile.mkdtemp()
+    wordsdict._WORDS_DICT_DATA_DIR = datadir
+    try:
+        wd = WordsDict()
+        measure(results, 'insert_new_words', len(words), lambda: [wd.get_word_index(word) for word in words])
+        for name, options in (('scan', {}), ('index', {'use_index': True}),
+                              ('cache', {'use_index': True, 'cache_size': len(words)})):
+            wd = WordsDict(**options)
+            measure(results, 'get_word_index_cold_' + name, len(lookups),
+                    lambda: [wd.get_word_index(word) for word in lookups])
+            measure(results, 'get_word_index_warm_' + name, len(lookups),
+                    lambda: [wd.get_word_index(word) for word in lookups])
+        wd = WordsDict(use_index=True)
+        measure(results, 'get_word_indices_batch', len(lookups), wd.get_word_indices, lookups)
+
+        wordsdict._WORDS_DICT_DATA_DIR = tempfile.mkdtemp()
+        with WordsDict(use_index=True, buffer_size=len(words)) as wd:
+            measure(results, 'insert_new_words_buffered', len(words),
+                    lambda: [wd.get_word_index(word) for word in words])
+        shutil.rmtree(wordsdict._WORDS_DICT_DATA_DIR, ignore_errors=True)
+    finally:
+        shutil.rmtree(datadir, ignore_errors=True)
+
+    text = get_random_text(rnd, words, int(args.text_mb * 1024 * 1024))
+    wd = WordsDict()
+    measure(results, 'format_words_bytes', len(text.encode('utf-8')), wd.format_words, text)
+    measure(results, 'format_words_stream_bytes', len(text.encode('utf-8')),
+            lambda: sum(1 for word in wd.format_words_stream(text)))
+
+
+def bench_datetime(results, rnd, args):
+    offsets = [rnd.randint(0, args.max_days) for i in range(args.dates)]
+    measure(results, 'get_real_from_any_large_days', len(offsets),
+            lambda: [get_real_from_any(2000, 0, days) for days in offsets])
+    dte = DateTimeExt()
+    dte.set_date_time(2000, 1, 1)
+    measure(results, 'add_any_minutes', args.dates, lambda: [dte.add_any(mins=5) for i in range(args.dates)])
+
+    dates = [get_real_from_any(2000, 0, days % 100000, days % 24, days % 60, days % 60, days % 1000)
+             for days in offsets]
+    measure(results, 'get_date_string_formated', len(dates),
+            lambda: [get_date_string_formated('YYYY-MM-DD', year, month, day)
+                     for year, month, day, hour, mins, secs, msecs in dates])
+    measure(results, 'get_time_string_formated', len(dates),
+            lambda: [get_time_string_formated('HH:MM:SS.MSS', hour, mins, secs, msecs)
+                     for year, month, day, hour, mins, secs, msecs in dates])
+
+
+def compare_results(results, filepath):
+    with open(filepath, 'r', encoding='utf-8') as rfile:
+        previous = json.load(rfile)['results']
+    print('\n%-32s %14s' % ('Compared to ' + filepath, 'speed ratio'))
+    for name, result in sorted(results.items()):
+        if (name in previous) and (previous[name]['per_second'] > 0):
+            print('%-32s %14.2f' % (name, result['per_second'] / previous[name]['per_second']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of WordsDict and DateTimeExt')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--words', type=int, default=5000, help='number of words of vocabulary')
+    parser.add_argument('--lookups', type=int, default=5000, help='number of words lookups')
+    parser.add_argument('--text-mb', type=float, default=2.0, help='size of text to format in MB')
+    parser.add_argument('--dates', type=int, default=20000, help='number of dates to compute and format')
+    parser.add_argument('--max-days', type=int, default=1000000, help='maximum days offset of dates')
+    parser.add_argument('--output', default=None, help='file to write JSON results')
+    parser.add_argument('--compare', default=None, help='JSON results of previous run to compare with')
+    args = parser.parse_args()
+
+    results = {}
+    bench_words_dict(results, random.Random(args.seed), args)
+    bench_datetime(results, random.Random(args.seed), args)
+
+    report = {'arguments': vars(args), 'python': sys.version, 'platform': platform.platform(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as wfile:
+            json.dump(report, wfile, indent=2, sort_keys=True)
+    if args.compare is not None:
+        compare_results(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
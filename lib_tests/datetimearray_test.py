@@ -0,0 +1,91 @@
+import random
+import pytest
+import datetimearray
+from datetimeext import *
+from datetimearray import *
+
+requires_numpy = pytest.mark.skipif(datetimearray.numpy is None, reason='NumPy is not installed')
+
+
+def get_random_date_times(rnd, number):
+    dtes = []
+    for i in range(number):
+        dte = DateTimeExt()
+        dte.set_msecs(rnd.randint(-10 ** 13, 10 ** 14))
+        dtes.append(dte)
+    dte = DateTimeExt()
+    dte.set_date_time(2020, 1, 31, 23, 59, 59, 999)
+    dtes.append(dte)
+    dte = DateTimeExt()
+    dte.set_date_time(2000, 12, 31)
+    dtes.append(dte)
+    return dtes
+
+
+@requires_numpy
+def test_fields_and_strings():
+    dtes = get_random_date_times(random.Random(1), 3000)
+    dta = DateTimeArray(dtes)
+    assert len(dta) == len(dtes) and dta[5] == dtes[5]
+    assert list(dta[2:4].get_msecs()) == [dte.get_msecs() for dte in dtes[2:4]]
+    fields = dta.get_date_time()
+    assert [tuple(int(values[i]) for values in fields) for i in range(len(dtes))] == \
+        [dte.get_date_time() for dte in dtes]
+    assert list(dta.get_day()) == [dte.get_day() for dte in dtes]
+    assert list(dta.get_seconds()) == [dte.get_seconds() for dte in dtes]
+    for form in ("YYYY-MM-DD", "YYYYMMDD", "yyyY-mM-dD"):
+        assert list(dta.get_date_string_formated(form)) == [dte.get_date_string_formated(form) for dte in dtes]
+    for form in ("HH:MM:SS.MSS", "HH:MM", "hH:hM", "hH:hM:sS.msS"):
+        assert list(dta.get_time_string_formated(form)) == [dte.get_time_string_formated(form) for dte in dtes]
+
+    other = DateTimeArray.from_date_time(*fields)
+    assert list(other.get_msecs()) == list(dta.get_msecs()) and list(other - dta) == [0] * len(dtes)
+    assert list(check_date_time_array([2020, 2021, 2020, 2020], [2, 2, 13, 1], [29, 29, 1, 1], [0, 0, 0, 24])) == \
+        [True, False, False, False]
+    assert list(check_day_array([31, 31, 30], 2021, [4, 5, 2])) == [False, True, False]
+
+
+@requires_numpy
+def test_add_and_limit():
+    rnd = random.Random(2)
+    dtes = get_random_date_times(rnd, 2000)
+    for args in ((0, 0, 3, 25, -61, 3600, 1001), (1, 1, 0, 0, 0, 0, 0), (-3, 25, 40, -30, 0, 0, -1)):
+        dta = DateTimeArray(dtes)
+        dta.add_any(*args)
+        for dte in dtes:
+            dte.add_any(*args)
+        assert list(dta.get_msecs()) == [dte.get_msecs() for dte in dtes]
+        dta.sub_any(*args)
+        for dte in dtes:
+            dte.sub_any(*args)
+        assert list(dta.get_msecs()) == [dte.get_msecs() for dte in dtes]
+
+    days = [rnd.randint(-1000, 1000) for dte in dtes]
+    dta = DateTimeArray(dtes)
+    dta.add_any(days=days, hours=5)
+    for dte, day in zip(dtes, days):
+        dte.add_any(days=day, hours=5)
+    assert list(dta.get_msecs()) == [dte.get_msecs() for dte in dtes]
+
+    for limits in ((2017, 10, 25, 12, 50), (2000, 2, 29), (None, 6, None, 12), (2000,), (None, None, None, 5, 0, 7)):
+        for method in ('limit_datetime_to_max', 'limit_datetime_to_min'):
+            dta = DateTimeArray(dtes)
+            getattr(dta, method)(*limits)
+            expected = []
+            for dte in dtes:
+                dte = DateTimeExt(dte.get_msecs())
+                getattr(dte, method)(*limits)
+                expected.append(dte.get_msecs())
+            assert list(dta.get_msecs()) == expected
+
+
+def main():
+    if datetimearray.numpy is None:
+        print('NumPy is not installed, tests are skipped')
+        return
+    test_fields_and_strings()
+    test_add_and_limit()
+
+
+if __name__ == '__main__':
+    main()
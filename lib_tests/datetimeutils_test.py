@@ -1,16 +1,178 @@
 import datetime
+import random
 from datetimeext import *
 
+
+def test_ordinal():
+    rnd = random.Random(1)
+    for i in range(20000):
+        date = datetime.date.fromordinal(rnd.randint(1, datetime.date.max.toordinal()))
+        ordinal = date.toordinal() + 365     # 0000-01-01 is the day 0
+        assert get_ordinal_from_date(date.year, date.month, date.day) == ordinal
+        assert get_date_from_ordinal(ordinal) == (date.year, date.month, date.day)
+
+    assert get_date_from_ordinal(0) == (0, 1, 1) and get_date_from_ordinal(365) == (0, 12, 31)
+    assert get_date_from_ordinal(-1) == (-1, 12, 31) and get_date_from_ordinal(-365) == (-1, 1, 1)
+    for ordinal in range(-150000, 150000, 7):
+        year, month, day = get_date_from_ordinal(ordinal)
+        assert check_day(day, year, month) and (get_ordinal_from_date(year, month, day) == ordinal)
+
+
+def test_get_real_from_any():
+    rnd = random.Random(2)
+    start = datetime.datetime(5000, 1, 1)
+    for i in range(20000):
+        args = [rnd.randint(-10 ** size, 10 ** size) for size in (2, 6, 3, 5, 6, 8)]
+        real = get_real_from_any(5000, args[0], args[1], args[2], args[3], args[4], args[5])
+        year, month = divmod(5000 * 12 + args[0], 12)
+        expected = datetime.datetime(year, month + 1, 1) - start + \
+            datetime.timedelta(days=args[1], hours=args[2], minutes=args[3], seconds=args[4], milliseconds=args[5])
+        expected = start + expected
+        assert real == (expected.year, expected.month, expected.day, expected.hour, expected.minute,
+                        expected.second, expected.microsecond // 1000)
+
+    assert get_real_from_any(2000, 0, 1000000) == (4737, 11, 28, 0, 0, 0, 0)
+    assert get_real_from_any(0, 0, -1, 0, 0, 0, -1) == (-1, 12, 30, 23, 59, 59, 999)
+
+
+def test_add_sub_any():
+    dte = DateTimeExt()
+    dte.set_date_time(2018, 9, 26, 23, 36)
+    dte.add_any(days=1000000, mins=30)
+    date = datetime.datetime(2018, 9, 26, 23, 36) + datetime.timedelta(days=1000000, minutes=30)
+    assert dte.get_date_time() == (date.year, date.month, date.day, date.hour, date.minute, 0, 0)
+    dte.sub_any(days=1000000, mins=30)
+    assert dte.get_date_time() == (2018, 9, 26, 23, 36, 0, 0)
+    dte.sub_any(months=9, msecs=1)
+    assert dte.get_date_time() == (2017, 12, 26, 23, 35, 59, 999)
+
+
+def test_timestamp():
+    rnd = random.Random(3)
+    msecs_of_year_0 = 366 * 24 * 60 * 60 * 1000     # 0000-01-01 is out of datetime range
+    dates = []
+    for i in range(2000):
+        date = datetime.datetime(1, 1, 1) + datetime.timedelta(milliseconds=rnd.randint(0, 3 * 10 ** 14))
+        dte = DateTimeExt()
+        dte.set_date_time(date.year, date.month, date.day, date.hour, date.minute, date.second,
+                          date.microsecond // 1000)
+        assert dte.get_msecs() == msecs_of_year_0 + \
+            (date - datetime.datetime(1, 1, 1)) // datetime.timedelta(milliseconds=1)
+        assert DateTimeExt(dte.get_msecs()).get_date_time() == dte.get_date_time()
+        assert dte.get_miliseconds() == date.microsecond // 1000
+        dates.append((date, dte))
+    dates.sort(key=lambda item: item[1])
+    assert [date for date, dte in dates] == sorted(date for date, dte in dates)
+    assert dates[-1][1] - dates[0][1] == (dates[-1][0] - dates[0][0]) // datetime.timedelta(milliseconds=1)
+
+    dte = DateTimeExt()
+    assert dte.get_date_time() == (0, 1, 1, 0, 0, 0, 0) and not hasattr(dte, '__dict__')
+    dte.set_date_time(2020, 1, 31, 12)
+    other = DateTimeExt(dte.get_msecs())
+    assert (dte == other) and (hash(dte) == hash(other)) and (len({dte, other}) == 1)
+    other.add_any(msecs=1)
+    assert (dte < other) and (other > dte) and (dte != other) and (other - dte == 1)
+    dte.modify_date_time(month=2)
+    assert dte.get_date_time() == (2020, 2, 29, 12, 0, 0, 0)
+    dte.modify_date_time(year=2021)
+    assert dte.get_date_string_formated() == '2021-02-28'
+
+
+def test_parse_strings():
+    rnd = random.Random(4)
+    dates = [get_date_from_ordinal(rnd.randint(-100000, 4000000)) for i in range(3000)]
+    for form in ("YYYY-MM-DD", "YYYYMMDD", "yyyY-mM-dD", "other"):
+        strings = [get_date_string_formated(form, *date) for date in dates]
+        assert [get_date_from_string(string, form) for string in strings] == dates
+        assert list(parse_many(strings, form)) == dates
+        assert list(parse_many((string + '\n' for string in strings), form)) == dates
+    times = [(rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59), rnd.randint(0, 999)) for i in range(3000)]
+    for form in ("HH:MM:SS.MSS", "hH:hM:sS.msS", "HH:MM", "hH:hM"):
+        strings = [get_time_string_formated(form, *time) for time in times]
+        expected = times if len(strings[0]) > 5 else [time[:2] + (0, 0) for time in times]
+        assert [get_time_from_string(string, form) for string in strings] == expected
+        assert list(parse_many(strings, form)) == expected
+
+    for string, form in (('2021-02-29', "YYYY-MM-DD"), ('2021-2-28', "YYYY-MM-DD"), ('20211301', "YYYYMMDD"),
+                         ('2021-02-1x', "YYYY-MM-DD"), ('24:00', "HH:MM"), ('12:60:00.000', "HH:MM:SS.MSS"),
+                         ('1:2:3', "hH:hM:sS.msS"), ('\u0661\u0662:00', "HH:MM")):
+        try:
+            list(parse_many([string], form))
+            assert False, string
+        except ValueError:
+            pass
+
+
+def test_calendar_queries():
+    rnd = random.Random(5)
+    for i in range(20000):
+        date = datetime.date.fromordinal(rnd.randint(1, datetime.date.max.toordinal()))
+        assert get_day_of_year(date.year, date.month, date.day) == date.timetuple().tm_yday
+        assert get_day_of_week(date.year, date.month, date.day) == date.isoweekday()
+        assert get_iso_week(date.year, date.month, date.day) == tuple(date.isocalendar())
+    for year in range(-500, 2500):
+        assert get_days_in_month(year, 2) == 28 + check_year_is_leap(year)
+        assert get_days_before_year(year + 1) - get_days_before_year(year) == get_days_in_year(year)
+        assert get_day_of_year(year, 12, 31) == get_days_in_year(year)
+
+    dte = DateTimeExt()
+    assert (dte.get_day_of_week() == 6) and (get_iso_week(0, 1, 1) == (-1, 52, 6))
+    dte.set_date_time(2021, 1, 3, 23, 59)
+    assert (dte.get_day_of_year() == 3) and (dte.get_day_of_week() == 7) and (dte.get_iso_week() == (2020, 53, 7))
+
+
+def get_add_any_range(start, stop, *args):
+    dte = DateTimeExt(start.get_msecs())
+    dtes = []
+    while (dte < stop) if (stop > start) else (dte > stop):
+        dtes.append(dte.get_date_time())
+        dte.add_any(*args)
+    return dtes
+
+
+def test_range():
+    start = DateTimeExt()
+    start.set_date_time(1999, 12, 30, 22, 50, 59, 999)
+    stop = DateTimeExt()
+    stop.set_date_time(2000, 3, 2, 1)
+    for step in ((0, 0, 0, 0, 5), (0, 0, 0, 1, 59, 59, 999), (0, 0, 1, 0, 0, 0, 1), (0, 0, 27, 23, 59, 59, 999),
+                 (0, 0, 45, 0, 7), (0, 1, 0, 0, 0, 0, 0), (0, 0, -3, 0, 0, 0, 0), (1, -11, 3, 0, 0, 0, 7)):
+        probe = DateTimeExt(start.get_msecs())
+        probe.add_any(*step)
+        begin, end = (start, stop) if probe > start else (stop, start)
+        expected = get_add_any_range(begin, end, *step)
+        assert [dte.get_date_time() for dte in DateTimeExt.range(begin, end, step)] == expected
+        assert list(DateTimeExt.range(begin, end, step, packed=True)) == \
+            [get_msecs_from_date_time(*fields) for fields in expected]
+        assert list(DateTimeExt.range(begin, end, step, "YYYY-MM-DD", "HH:MM:SS.MSS")) == \
+            [get_date_string_formated("YYYY-MM-DD", *fields[:3]) + ' ' +
+             get_time_string_formated("HH:MM:SS.MSS", *fields[3:]) for fields in expected]
+
+    dates = list(DateTimeExt.range(start, start.get_msecs() + 3 * 86400000, 86400000, date_form="yyyY-mM-dD"))
+    assert dates == ['1999-12-30', '1999-12-31', '2000-1-1']
+    assert list(DateTimeExt.range(start, stop, 15 * 60000, time_form="HH:MM"))[:3] == ['22:50', '23:05', '23:20']
+    packed = DateTimeExt.range(start, stop, 5 * 60000, packed=True)
+    assert (packed.typecode == 'q') and (len(packed) == (stop - start + 5 * 60000 - 1) // (5 * 60000))
+    assert list(DateTimeExt.range(stop, start, 60000)) == []
+
+
 def main():
 
     dte = DateTimeExt()
     dte.set_date_time(2018, 9, 26, 23, 36)
-    assert (dte.get)
+    assert (dte.get_year() == 2018)
     print(dte.get_date_time())
     dte.limit_datetime_to_max(2017, 10, 25, 12, 50)
     print(dte.get_date_time())
     dte.add_any(50, 1, 3, 10, 25)
     print(dte.get_date_time())
+    test_ordinal()
+    test_get_real_from_any()
+    test_add_sub_any()
+    test_timestamp()
+    test_parse_strings()
+    test_calendar_queries()
+    test_range()
 
-if __name__ is '__main__':
-    main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,591 @@
+import functools
+import io
+import multiprocessing
+import os
+import pathlib
+import random
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import wordsdict
+from wordsdict import *
+
+
+def test_index_lookup(tmp_path):
+    datadir = str(tmp_path)
+    wd = WordsDict(data_dir=datadir)
+    wdi = WordsDict(data_dir=datadir, use_index=True)
+
+    assert wd.get_word_index('123') == 123
+    assert wd.check_word('hello') == wordsdict._WORD_EMPTY
+    first = wd.get_word_index('hello', 'en')
+    assert first == ord('h') * wordsdict._WORDS_PER_TYPE_MAX
+    second = wd.get_word_index('home', 'en')
+    assert second == first + 1
+    assert wd.get_word_index('hello', 'en') == first
+
+    assert wdi.check_word('hello', 'en') == first
+    assert wdi.check_word('hello') == first
+    assert wdi.check_word('hello', 'fr') == wordsdict._WORD_EMPTY
+    third = wdi.get_word_index('hello', 'fr')
+    assert third == second + 1
+    assert wdi.check_word('hello', 'fr') == third
+    assert wd.check_word('hello', 'fr') == third
+    assert wdi.check_word('home') == second
+
+    us = wd.get_word_index('hi', 'en-US')       # lang is not matched by prefix
+    assert wd.check_word('hi', 'en') == wdi.check_word('hi', 'en') == wordsdict._WORD_EMPTY
+    assert wd.get_word_index('hi', 'en') == us + 1
+    assert wdi.check_word('hi', 'en') == WordsDict(data_dir=datadir).check_word('hi', 'en') == us + 1
+    assert wd.check_word('hi') == wdi.check_word('hi') == us
+
+
+def test_next_index(tmp_path):
+    datadir = str(tmp_path)
+    wd = WordsDict(data_dir=datadir)
+    other = WordsDict(data_dir=datadir)
+    base = ord('q') * wordsdict._WORDS_PER_TYPE_MAX
+
+    assert wd.get_word_index('quick') == base
+    assert wd.get_word_index('quiet') == base + 1
+    assert other.get_word_index('quote') == base + 2     # the shard is appended by another writer
+    assert wd.get_word_index('quest') == base + 3
+
+    filepath = wd._get_file_path('quick')
+    with open(filepath, 'a', encoding='utf-8') as wfile:
+        wfile.write('quota\t\t' + str(base + wordsdict._WORDS_PER_TYPE_MAX - 1) + '\n')
+    assert wd.get_word_index('quiz') == wordsdict._WORD_EMPTY      # words number overflow
+    assert wd.check_word('quota') == base + wordsdict._WORDS_PER_TYPE_MAX - 1
+
+
+def test_word_indices(tmp_path):
+    datadir = str(tmp_path / 'words')
+    os.mkdir(datadir)
+    wd = WordsDict(data_dir=datadir)
+    text = 'The cat and the dog, 42 cats; 3rd dog. #1st cat & the 7 dogs'
+    words = wd.format_words(text)
+    assert wd.get_word_index('dog') == ord('d') * wordsdict._WORDS_PER_TYPE_MAX
+
+    indices = wd.get_word_indices(words)
+    assert len(indices) == len(words.split())
+    assert indices == [wd.check_word(word) for word in words.split()]
+    assert indices[words.split().index('dog')] == ord('d') * wordsdict._WORDS_PER_TYPE_MAX
+    assert wd.get_word_indices(['cat', 'cat', 'cow', '42', 'a b']) == \
+           [wd.check_word('cat'), wd.check_word('cat'), wd.check_word('cow'), 42, wordsdict._WORD_EMPTY]
+
+    datadir = str(tmp_path / 'sequential')
+    os.mkdir(datadir)
+    wd = WordsDict(data_dir=datadir)
+    sequential = [wd.get_word_index(word) for word in words.split()]
+    assert os.listdir(datadir) != []
+    datadir = str(tmp_path / 'batch')
+    os.mkdir(datadir)
+    assert WordsDict(data_dir=datadir, use_index=True).get_word_indices(words) == sequential
+    assert os.listdir(datadir) != []
+
+
+def get_random_text(rnd, length):
+    symbols = 'aAz9_0.#-\'%&, \t\n\u00e9\u0456\u0661'
+    return ''.join(rnd.choice(symbols) for i in range(length))
+
+
+def format_words_legacy(string):
+    "format_words implementation of multiple regular expression passes"
+    string = re.sub(r'\s', '\n', string)
+    string = re.sub(r'(^\d+$)', '', string, flags=re.MULTILINE)
+    string = re.sub(r'(^_+)|(_+$)', '', string, flags=re.MULTILINE)
+    string = string.replace('.', '')
+    string = string.replace('\n\n', '\n')
+
+    recomp = re.compile(r"(^\d\w+$)|(^\d\w*\'\w+$)|(^\d\w*-\w+$)|(^\d\w*-\w+$)|(^\d\w*%$)", flags=re.MULTILINE)
+    dstrlist = recomp.findall(string)
+    string = recomp.sub('', string)
+    recomp = re.compile(r"(^#\d\w+$)|(^#\d\w*\'\w+$)|(^#\d\w*-\w+$)|(^#\d\w*-\w+$)", flags=re.MULTILINE)
+    nstrlist = recomp.findall(string)
+    string = recomp.sub('', string)
+    recomp = re.compile(r"(^\w+$)|(^\w+-\w+$)|(^\w+\'\w+$)|(^\w+\'\w+\'\w+$)|(^\w+-\w+-\w+$)|(^\w+&\w+$)",
+                        flags=re.MULTILINE)
+    wstrlist = recomp.findall(string)
+
+    resstr = ''
+    for strlist in (wstrlist, dstrlist, nstrlist):
+        if len(strlist) != 0:
+            resstr = resstr + '\n'.join(str(''.join(st)) for st in strlist) + '\n'
+    return resstr
+
+
+def test_format_words():
+    wd = WordsDict()
+    text = "Hello, world! 12 3d-x #5th don't a_b_ _x_ 1.5 rock&roll 50% __ _12_ x-y-z a'b'c #1-st"
+    assert wd.format_words(text) == format_words_legacy(text)
+    assert wd.format_words('') == ''
+    rnd = random.Random(5)
+    for n in range(2000):
+        text = get_random_text(rnd, rnd.randint(0, 100))
+        assert wd.format_words(text) == format_words_legacy(text), text
+
+
+def test_format_words_stream():
+    wd = WordsDict()
+    rnd = random.Random(7)
+    for n in range(300):
+        text = get_random_text(rnd, rnd.randint(0, 200))
+        items = list(wd.format_words_stream(text, with_type=True))
+        words = [word for wtype in (wordsdict._WORD_TYPE_TEXT, wordsdict._WORD_TYPE_DIGIT,
+                                                 wordsdict._WORD_TYPE_NUMBER)
+                 for itype, word in items if itype == wtype]
+        assert ''.join(word + '\n' for word in words) == wd.format_words(text), text
+
+        cuts = sorted(rnd.randint(0, len(text)) for i in range(5))
+        chunks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+        assert list(wd.format_words_stream(chunks, with_type=True)) == items
+        assert list(wd.format_words_stream(io.StringIO(text), chunk_size=3)) == [word for itype, word in items]
+
+
+def test_bin_backend(tmp_path):
+    datadir = str(tmp_path)
+    wd = WordsDict(data_dir=datadir)
+    words = ['alpha', 'beta', 'alpine', 'apple', 'Alpha', '3rd', '\u0456\u043c\u044f']
+    indices = wd.get_word_indices(words, 'en')
+    assert wd.get_word_index('alpha', 'uk') == indices[0] + 3
+    assert wd.convert_shards_to_bin() == 5
+
+    wdb = WordsDict(data_dir=datadir, backend='bin')
+    assert [wdb.check_word(word, 'en') for word in words] == indices
+    assert wdb.check_word('alpha') == indices[0]
+    assert wdb.check_word('alpha', 'uk') == indices[0] + 3
+    assert wdb.check_word('alps') == wordsdict._WORD_EMPTY
+
+    assert wd.get_word_index('alps') == indices[0] + 4          # added after the conversion
+    assert wdb.check_word('alps') == indices[0] + 4
+    assert wdb.get_word_index('alloy', 'en') == indices[0] + 5
+    assert wdb.get_word_indices(['amber', 'alloy', 'beta'], 'en') == [indices[0] + 6, indices[0] + 5, indices[1]]
+    assert wd.check_word('amber', 'en') == indices[0] + 6
+    assert wdb.get_word_index('bravo') == indices[1] + 1
+
+
+def insert_words_process(datadir, number):
+    rnd = random.Random(number)
+    words = ['w' + str(i) for i in range(150)] + ['x' + str(i) for i in range(150)]
+    rnd.shuffle(words)
+    if number % 3 == 0:
+        wd = WordsDict(data_dir=datadir)
+        return [(word, wd.get_word_index(word)) for word in words]
+    wd = WordsDict(data_dir=datadir, use_index=(number % 3 == 1))
+    return list(zip(words, wd.get_word_indices(words[:100]) + [wd.get_word_index(word) for word in words[100:]]))
+
+
+@pytest.mark.skipif(wordsdict.fcntl is None, reason='fcntl is not available')
+def test_processes_insert(tmp_path):
+    datadir = str(tmp_path)
+    with multiprocessing.get_context('fork').Pool(6) as pool:
+        results = pool.map(functools.partial(insert_words_process, datadir), range(12))
+
+    rows = []
+    for dirpath, dirnames, filenames in os.walk(datadir):
+        for filename in filenames:
+            if filename.endswith('.csv'):
+                with open(os.path.join(dirpath, filename), encoding='utf-8') as rfile:
+                    rows += [tuple(line.split('\t')) for line in rfile]
+    assert len(rows) == 300
+    assert len(set(word for word, lang, index in rows)) == 300
+    assert len(set(index for word, lang, index in rows)) == 300
+    indices = dict((word, int(index)) for word, lang, index in rows)
+    for result in results:
+        assert dict(result) == indices
+
+
+def test_threads_insert(tmp_path):
+    datadir = str(tmp_path)
+    words = ['t' + str(i) for i in range(100)] + ['u' + str(i) for i in range(100)]
+    for wd in (WordsDict(data_dir=datadir, cache_size=50),
+               WordsDict(data_dir=datadir, use_index=True, cache_size=1000)):
+        def insert_words(number):
+            rnd = random.Random(number)
+            twords = list(words)
+            rnd.shuffle(twords)
+            if number % 2 == 0:
+                return list(zip(twords, wd.get_word_indices(twords)))
+            return [(word, wd.get_word_index(word)) for word in twords]
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(insert_words, range(16)))
+        indices = dict(results[0])
+        assert len(set(indices.values())) == 200
+        for result in results:
+            assert dict(result) == indices
+
+    hits, misses, size = wd.get_cache_stats()
+    assert (hits + misses == 16 * 200) and (size == 200)
+    assert wd.check_word('t7') == indices['t7']
+    assert wd.get_cache_stats()[0] == hits + 1
+
+
+def test_word_by_index(tmp_path):
+    datadir = str(tmp_path)
+    wd = WordsDict(data_dir=datadir)
+    words = ['cat', 'dog', 'cow', '\u0456\u043c\u044f', '#1st', 'x', '7', '9999999999', 'cat']
+    indices = wd.get_word_indices(words, 'en')
+    assert wd.get_word_index('cat', 'uk') == indices[0] + 2
+    assert wd.decode(indices) == words
+    assert wd.get_word_by_index(indices[0] + 2) == 'cat'
+    assert wd.get_word_by_index(indices[0] + 3) is None
+    assert wd.get_word_by_index(wordsdict._WORD_EMPTY) == ''
+    assert wd.decode([wordsdict._WORD_TEXT_START, indices[1], wordsdict._WORD_TEXT_END]) == ['dog']
+
+    assert WordsDict(data_dir=datadir).get_word_index('crow') == indices[0] + 3     # added by other writer
+    assert wd.get_word_by_index(indices[0] + 3) == 'crow'
+
+    index = indices[0] + wordsdict._WORDS_PER_TYPE_MAX - 1     # the last position of shard
+    with open(wd._get_file_path('cat'), 'a', encoding='utf-8') as wfile:
+        wfile.write('cub\ten\t' + str(index) + '\n')
+    assert wd.get_word_by_index(index) == 'cub'
+    assert len(wd._shards_words[wd._get_file_path('cat')]) == 5
+
+
+def test_encode_text(tmp_path):
+    datadir = str(tmp_path)
+    wd = WordsDict(data_dir=datadir)
+    text = 'The cat and the dog, 42 cats; 3rd dog. #1st cat'
+    encoded = wd.encode_text(text)
+    assert encoded.typecode == 'I' and encoded.itemsize == 4
+    assert encoded[0] == wordsdict._WORD_TEXT_START and encoded[-1] == wordsdict._WORD_TEXT_END
+    assert wd.decode(encoded) == list(wd.format_words_stream(text))
+    assert wd.encode_text(io.StringIO(text)) == encoded
+
+    filepath = os.path.join(datadir, 'encoded.wde')
+    save_encoded(filepath, encoded)
+    assert os.path.getsize(filepath) == 4 + 4 * len(encoded)
+    assert load_encoded(filepath) == encoded
+
+    encoded = wd.encode_text('\u0456\u043c\u044f cat', typecode='Q')
+    save_encoded(filepath, encoded)
+    assert load_encoded(filepath) == encoded
+    assert wd.decode(load_encoded(filepath)) == ['\u0456\u043c\u044f', 'cat']
+    if wordsdict.numpy is not None:
+        assert list(wd.encode_text(text, as_numpy=True)) == list(wd.encode_text(text))
+        assert list(load_encoded(filepath, as_numpy=True)) == list(encoded)
+        assert wd.decode(wd.encode_text(text, as_numpy=True)) == list(wd.format_words_stream(text))
+        assert wd.decode(load_encoded(filepath, as_numpy=True)) == ['\u0456\u043c\u044f', 'cat']
+
+    text = '\u043f\u0440\u0438\u0432\u0456\u0442 world'
+    encoded = wd.encode_text(text)
+    assert encoded.typecode == 'Q' and wd.decode(encoded) == ['\u043f\u0440\u0438\u0432\u0456\u0442', 'world']
+    try:
+        wd.encode_text('\u0441\u0432\u0456\u0442 sun', typecode='I')
+        assert False
+    except AssertionError as error:
+        assert str(error) == "Words starting with symbols above 0xFF need typecode 'Q'"
+    assert wd.check_word('\u0441\u0432\u0456\u0442') == wd.check_word('sun') == wordsdict._WORD_EMPTY
+
+
+def test_warm_up(tmp_path):
+    datadir = str(tmp_path)
+    wd = WordsDict(data_dir=datadir)
+    words = ['alpha', 'beta', '\u0456\u043c\u044f', '\u4e2d\u6587']
+    indices = wd.get_word_indices(words)
+    paths = [wd._get_file_path(word) for word in words]
+    assert paths[2].endswith('/wd_0xfff/wd_0x456.csv') and paths[3].endswith('/wd_0x4fff/wd_0x4e2d.csv')
+
+    wdi = WordsDict(data_dir=datadir, use_index=True)
+    assert wdi.warm_up('abc\u0456') == 3
+    assert len(wdi._shards) == 3 and len(wdi._marks) == 3
+    assert wdi.get_word_indices(words + ['bravo']) == indices + [indices[1] + 1]
+
+
+def test_buffered_words(tmp_path):
+    words = ['red', 'rose', 'ruby', 'rose', '\u0456\u043c\u044f', 'rust', 'ruby', 'reed']
+    datadir = str(tmp_path / 'words')
+    os.mkdir(datadir)
+    indices = [WordsDict(data_dir=datadir).get_word_index(word) for word in words]
+
+    for use_index in (False, True):
+        datadir = str(tmp_path / ('buffered%d' % use_index))
+        os.mkdir(datadir)
+        filepath = os.path.join(datadir, 'wd_0xff', 'wd_0x72.csv')
+        with WordsDict(data_dir=datadir, use_index=use_index, buffer_size=100) as wd:
+            assert [wd.get_word_index(word) for word in words[:4]] == indices[:4]
+            assert wd.get_word_indices(words[3:]) == indices[3:]
+            assert not os.path.exists(filepath)
+            assert wd.check_word('ruby') == indices[2]
+            assert wd.get_word_by_index(indices[5]) == 'rust'
+            wd.flush()
+            assert WordsDict(data_dir=datadir).check_word('rust') == indices[5]
+            assert wd.get_word_index('rye') == indices[-1] + 1
+        assert WordsDict(data_dir=datadir).check_word('rye') == indices[-1] + 1
+
+    datadir = str(tmp_path / 'flushed')
+    os.mkdir(datadir)
+    wd = WordsDict(data_dir=datadir, buffer_size=3)
+    wd.get_word_indices(words[:3])
+    assert wd.check_word('ruby') == indices[2] and len(wd._pending) == 0
+    wd = WordsDict(data_dir=datadir, buffer_size=100, flush_interval=0)
+    assert wd.get_word_index('rust') == indices[5] and len(wd._pending) == 0
+    wd = WordsDict(data_dir=datadir, buffer_size=100, flush_interval=0.2)
+    rye = wd.get_word_index('rye')
+    assert WordsDict(data_dir=datadir).check_word('rye') == wordsdict._WORD_EMPTY
+    for i in range(50):             # no more words are added, timer writes them
+        time.sleep(0.1)
+        if len(wd._pending) == 0:
+            break
+    assert WordsDict(data_dir=datadir).check_word('rye') == rye
+
+
+def test_compact_shards(tmp_path):
+    datadir = str(tmp_path)
+    wd = WordsDict(data_dir=datadir)
+    words = ['sun', 'sea', 'sky', 'star', 'sand', 'salt', 'soil', 'sea', '\u0456\u043c\u044f']
+    indices = wd.get_word_indices(words, 'en')
+    assert wd.get_word_index('sun', 'uk') == indices[0] + 7
+    filepath = wd._get_file_path('sun')
+    with open(filepath, 'a', encoding='utf-8') as wfile:
+        wfile.write('sky\ten\t' + str(indices[0] + 100) + '\nbroken line\nsalt\ten\t' + str(indices[5]) + '\n')
+    known = [(word, lang) for word in words + ['sun', 'sky'] for lang in ('en', 'uk', '')]
+    before = [wd.check_word(word, lang) for word, lang in known]
+
+    assert wd.compact_shards() == 2
+    with open(filepath, encoding='utf-8') as rfile:
+        lines = rfile.read().split('\n')[:-1]
+    assert len(lines) == 9 and lines[0].startswith('salt\t') and lines[-1].startswith('sun\tuk')
+    assert [WordsDict(data_dir=datadir).check_word(word, lang) for word, lang in known] == before
+    assert WordsDict(data_dir=datadir).get_word_by_index(indices[0] + 100) == 'sky'
+    assert WordsDict(data_dir=datadir).get_word_index('snow') == indices[0] + 101
+
+    assert WordsDict(data_dir=datadir).compact_shards(split_size=4) == 1     # the repeated 'sky' is not the last index
+    assert os.path.exists(os.path.join(datadir, 'wd_split.csv'))
+    assert os.path.exists(filepath[:-4] + '_0x6b.csv')
+    for wdc in (WordsDict(data_dir=datadir), WordsDict(data_dir=datadir, use_index=True)):
+        assert [wdc.check_word(word, lang) for word, lang in known] == before
+        assert wdc.get_word_by_index(indices[2]) == 'sky'
+        assert wdc.get_word_indices(['snow', 'sun', 'sea']) == [indices[0] + 101, indices[0], indices[1]]
+    assert WordsDict(data_dir=datadir).get_word_index('slate', 'en') == indices[0] + 102
+    WordsDict(data_dir=datadir).convert_shards_to_bin()
+    wdb = WordsDict(data_dir=datadir, backend='bin')
+    assert [wdb.check_word(word, lang) for word, lang in known] == before
+    assert wdb.check_word('slate', 'en') == indices[0] + 102
+
+    assert WordsDict(data_dir=datadir).compact_shards() == 0      # the last index line is not repeated in split files
+    with open(filepath, encoding='utf-8') as rfile:
+        assert rfile.read() == 'slate\ten\t' + str(indices[0] + 102) + '\n'
+    assert [WordsDict(data_dir=datadir).check_word(word, lang) for word, lang in known] == before
+    assert WordsDict(data_dir=datadir).get_word_indices(['slate', 'sum']) == [indices[0] + 102, indices[0] + 103]
+    assert WordsDict(data_dir=datadir, backend='bin').check_word('sum') == indices[0] + 103
+
+
+def test_split_by_other(tmp_path):
+    datadir = str(tmp_path)
+    words = ['sun', 'sea', 'sky', 'star', 'sand', 'salt']
+    indices = WordsDict(data_dir=datadir).get_word_indices(words)
+    opened = [WordsDict(data_dir=datadir), WordsDict(data_dir=datadir, use_index=True)]
+    assert WordsDict(data_dir=datadir).compact_shards(split_size=2) == 0
+    for wd in opened:
+        assert [wd.check_word(word) for word in words] == indices
+        assert wd.get_word_indices(words + ['snow']) == indices + [indices[-1] + 1]
+    assert WordsDict(data_dir=datadir).compact_shards(split_size=2) == 0
+
+
+def test_compact_by_other(tmp_path):
+    words = ['sun', 'sea', 'sky', 'star', 'sand', 'soft', 'salt', 'soil']
+    for i, (options, split_size) in enumerate([({}, None), ({}, 2), ({'use_index': True}, None),
+                                               ({'use_index': True}, 2), ({'bloom_fp_rate': 0.01}, 2)]):
+        datadir = str(tmp_path / str(i))
+        os.mkdir(datadir)
+        wd = WordsDict(data_dir=datadir, **options)
+        indices = wd.get_word_indices(words)
+        WordsDict(data_dir=datadir).get_word_indices(['sun', 'sky'], 'uk')
+        assert wd.get_word_index('sup') == indices[-1] + 3       # shard is read after other writer
+        other = WordsDict(data_dir=datadir)
+        assert other.compact_shards(split_size) == 0
+        snow = other.get_word_index('snow')
+        assert wd.get_word_index('swim') == snow + 1
+        assert [wd.check_word(word) for word in words + ['snow']] == indices + [snow]
+        assert wd.get_word_by_index(snow) == 'snow'
+
+
+def test_stats(tmp_path):
+    datadir = str(tmp_path)
+    exported = []
+    wd = WordsDict(data_dir=datadir, stats=True, stats_callback=exported.append)
+    indices = [wd.get_word_index('apple'), wd.get_word_index('avocado'), wd.get_word_index('apple')]
+    filepath = wd._get_file_path('apple')
+    stats = wd.get_stats()
+    assert indices[2] == indices[0] and stats['words_allocated'] == 2
+    assert stats['bytes_written'] == os.path.getsize(filepath)
+    assert stats['lines_scanned'] >= 2 and stats['bytes_read'] >= stats['bytes_written']
+    assert stats['methods']['get_word_index'][0] == 3 and stats['methods']['get_word_index'][1] > 0
+
+    wd.reset_stats()
+    assert wd.get_word_indices(['apple', 'avocado', 'apricot']) == indices[:2] + [indices[1] + 1]
+    stats = wd.get_stats()
+    assert stats['files_opened'] >= 2 and stats['lines_scanned'] >= 2 and stats['words_allocated'] == 1
+    assert list(stats['methods']) == ['get_word_indices'] and stats['methods']['get_word_indices'][0] == 1
+
+    wdc = WordsDict(data_dir=datadir, use_index=True, cache_size=10, stats=True, stats_callback=exported.append,
+                    stats_interval=0)
+    assert wdc.get_word_index('apple') == indices[0] and wdc.get_word_index('apple') == indices[0]
+    assert exported[-1]['cache_hits'] == 1 and exported[-1]['cache_misses'] == 1 and exported[-1]['cache_words'] == 1
+    count = len(exported)
+    wd.close()
+    assert len(exported) == count + 1 and exported[-1]['methods']['get_word_indices'][0] == 1
+
+    wdn = WordsDict(data_dir=datadir)
+    assert (wdn.get_stats() is None) and ('get_word_index' not in vars(wdn))
+    assert wdn.get_word_index('apricot') == indices[1] + 1
+
+
+def test_ingest(tmp_path):
+    datadir = str(tmp_path)
+    rnd = random.Random(9)
+    texts = [get_random_text(rnd, 20000), '12345 67890\n' * 50 + get_random_text(rnd, 300), '']
+    filepaths = []
+    for i, text in enumerate(texts):
+        filepaths.append(os.path.join(datadir, 'text%d.txt' % i))
+        with open(filepaths[-1], 'w', encoding='utf-8') as wfile:
+            wfile.write(text)
+    outdir = str(tmp_path / 'encoded')
+    os.mkdir(outdir)
+    progress = io.StringIO()
+    words, newwords, size, seconds = ingest(filepaths, 'en', jobs=2, output_dir=outdir, typecode='Q',
+                                            chunk_size=500, progress=progress, data_dir=datadir)
+    assert size == sum(os.path.getsize(filepath) for filepath in filepaths)
+    assert progress.getvalue().split('\n')[-2].startswith('Files 3/3, 0.0 MB, %d words, ' % words)
+
+    wd = WordsDict(data_dir=datadir)
+    total = 0
+    for filepath, text in zip(filepaths, texts):
+        encoded = load_encoded(os.path.join(outdir, os.path.basename(filepath)) + '.wde')
+        fwords = list(wd.format_words_stream(text))
+        assert (len(encoded) == len(fwords) + 2) and (encoded == wd.encode_text(text, 'en', 'Q'))
+        total += len(fwords)
+    assert (words == total) and (0 < newwords < total)
+
+    wordsdict.main(['--data-dir', datadir, 'ingest', '--quiet', '--jobs', '1', '--lang', 'en', '--typecode', 'Q',
+                    filepaths[0]])
+    assert load_encoded(filepaths[0] + '.wde') == load_encoded(os.path.join(outdir, 'text0.txt.wde'))
+
+    texts = ['good day\n' * 10, 'good day\n' * 10 + '\u043f\u0440\u0438\u0432\u0456\u0442 world\n']
+    for i, text in enumerate(texts):
+        with open(filepaths[i], 'w', encoding='utf-8') as wfile:
+            wfile.write(text)
+    ingest(filepaths[:2], 'en', jobs=1, output_dir=outdir, chunk_size=20, progress=None, data_dir=datadir)
+    encoded = [load_encoded(os.path.join(outdir, os.path.basename(filepath)) + '.wde') for filepath in filepaths[:2]]
+    assert (encoded[0].typecode == 'I') and (encoded[0] == wd.encode_text(texts[0], 'en'))
+    assert (encoded[1].typecode == 'Q') and (encoded[1] == wd.encode_text(texts[1], 'en'))
+    wordsdict.main(['--data-dir', datadir, 'ingest', '--quiet', '--jobs', '1', '--lang', 'en', filepaths[1]])
+    assert load_encoded(filepaths[1] + '.wde') == encoded[1]
+
+
+def test_ingest_read_ahead():
+    read = []
+
+    def get_chunks():
+        for i in range(50):
+            read.append(i)
+            yield (0, i, 'word%d text' % i)
+
+    with multiprocessing.get_context('fork').Pool(2, wordsdict._init_ingest_worker) as pool:
+        results = wordsdict._format_ingest_chunks_in_pool(pool, get_chunks(), 2)
+        assert next(results) == (0, 0, 'word0\ntext')
+        assert len(read) == 2 * wordsdict._INGEST_CHUNKS_PER_JOB + 1
+        assert [position for fileno, position, text in results] == list(range(1, 50))
+
+
+def get_dir_files(dirpath):
+    return sorted((path, os.path.getsize(os.path.join(path, name))) for path, dirnames, filenames in os.walk(dirpath)
+                  for name in filenames + dirnames)
+
+
+def test_read_only(tmp_path):
+    datadir = str(tmp_path)
+    words = ['alpha', 'beta', 'bravo', '\u0456\u043c\u044f', 'x', '42']
+    indices = WordsDict(data_dir=datadir).get_word_indices(words, 'en')
+    WordsDict(data_dir=datadir).convert_shards_to_bin()
+    files = get_dir_files(datadir)
+
+    unknown = ['gamma', 'alpha', '\u4e2d\u6587', 'beta']
+    for options in ({}, {'use_index': True}, {'backend': 'bin'}):
+        wd = WordsDict(data_dir=datadir, read_only=True, **options)
+        if wd._use_index:
+            assert wd.preload() == 3
+        assert [wd.get_word_index(word, 'en') for word in words] == indices
+        assert wd.get_word_indices(words + unknown, 'en') == indices + [wordsdict._WORD_EMPTY, indices[0],
+                                                                         wordsdict._WORD_EMPTY, indices[1]]
+        assert wd.get_word_index('gamma') == wd.check_word('gamma') == wordsdict._WORD_EMPTY
+        assert wd.get_word_by_index(indices[2]) == 'bravo' and wd.get_word_by_index(0x4e2d000001) is None
+        wd.close()
+        assert get_dir_files(datadir) == files
+
+    try:
+        WordsDict(data_dir=datadir, read_only=True).compact_shards()
+        assert False
+    except AssertionError as error:
+        assert str(error) == 'Dictionary is read only'
+
+
+def test_bloom(tmp_path):
+    datadir = str(tmp_path)
+    words = ['alpha', 'beta', 'bravo', 'banana', '\u0456\u043c\u044f', 'x']
+    wd = WordsDict(data_dir=datadir, bloom_fp_rate=0.001, stats=True)
+    indices = wd.get_word_indices(words, 'en')
+    assert [wd.check_word(word, 'en') for word in words] == indices
+    wd.reset_stats()
+    unknown = ['gamma', 'bob', 'brown', 'xylophone']
+    assert [wd.check_word(word, 'en') for word in unknown] == [wordsdict._WORD_EMPTY] * len(unknown)
+    assert wd.get_stats()['lines_scanned'] == 0
+    assert wd.get_bloom_stats()[0] == 5 and wd.get_bloom_stats()[2] == 5     # 'x' has no shard
+    wd.close()
+    assert sorted(name for path, dirnames, filenames in os.walk(datadir) for name in filenames
+                  if name.endswith('.bloom')) == ['wd_0x456.bloom', 'wd_0x61.bloom', 'wd_0x62.bloom']
+
+    WordsDict(data_dir=datadir).get_word_index('gamma', 'en')      # other writer without filters
+    wd = WordsDict(data_dir=datadir, bloom_fp_rate=0.001)
+    assert wd.check_word('bravo', 'en') == indices[2] and wd.check_word('gamma', 'en') != wordsdict._WORD_EMPTY
+    assert wd.get_bloom_stats()[2] == 4     # 3 words are read from saved filter
+    wd.close()
+    wd = WordsDict(data_dir=datadir, bloom_fp_rate=0.001, read_only=True)
+    assert wd.check_word('gamma', 'en') != wordsdict._WORD_EMPTY and wd.check_word('bob', 'en') == wordsdict._WORD_EMPTY
+    wd.close()
+
+    wd = WordsDict(data_dir=datadir, bloom_fp_rate=0.01)
+    many = ['b%d' % i for i in range(3000)]
+    newindices = wd.get_word_indices(many)
+    assert [wd.check_word(word) for word in many] == newindices
+    assert wd.get_bloom_stats()[1] > 1024
+    wd.compact_shards()
+    assert [wd.check_word(word) for word in many] == newindices and wd.check_word('bravo', 'en') == indices[2]
+    wd.close()
+
+
+def run_in_temp_dir(test):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        test(pathlib.Path(tmpdir))
+
+
+def main():
+    run_in_temp_dir(test_index_lookup)
+    run_in_temp_dir(test_next_index)
+    run_in_temp_dir(test_word_indices)
+    run_in_temp_dir(test_bin_backend)
+    if wordsdict.fcntl is not None:
+        run_in_temp_dir(test_processes_insert)
+    run_in_temp_dir(test_threads_insert)
+    run_in_temp_dir(test_word_by_index)
+    run_in_temp_dir(test_encode_text)
+    run_in_temp_dir(test_warm_up)
+    run_in_temp_dir(test_buffered_words)
+    run_in_temp_dir(test_compact_shards)
+    run_in_temp_dir(test_split_by_other)
+    run_in_temp_dir(test_compact_by_other)
+    run_in_temp_dir(test_stats)
+    run_in_temp_dir(test_ingest)
+    test_ingest_read_ahead()
+    run_in_temp_dir(test_read_only)
+    run_in_temp_dir(test_bloom)
+    test_format_words()
+    test_format_words_stream()
+
+
+if __name__ == '__main__':
+    main()